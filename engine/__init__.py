@@ -53,6 +53,11 @@ def delta():
     return manager.engine.delta
 
 
+def alpha():
+    global manager
+    return manager.engine.alpha
+
+
 def get_asset(asset):
     global manager
     return manager.assets.get(asset)
@@ -0,0 +1,321 @@
+import math
+
+import moderngl
+import numpy as np
+import pygame
+
+
+# Lit polygons and their surfaces for lights that only static geometry occludes,
+# keyed by (level position, light position, radius, mode, angle step)
+baked_lights = {}
+
+
+def clear_baked_lights(level_position=None):
+    if level_position is None:
+        baked_lights.clear()
+        return
+    for key in [k for k in baked_lights if k[0] == level_position]:
+        del baked_lights[key]
+
+
+def render_polygon(colour, points):
+    # Draws a translucent polygon onto its own surface once, returns the surface and where to blit it
+    if len(points) < 3:
+        return None, pygame.Vector2()
+    xs, ys = zip(*points)
+    min_x, min_y = math.floor(min(xs)), math.floor(min(ys))
+    size = (math.ceil(max(xs)) - min_x + 1, math.ceil(max(ys)) - min_y + 1)
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.polygon(surface, colour, [(x - min_x, y - min_y) for x, y in points])
+    return surface, pygame.Vector2(min_x, min_y)
+
+
+# Visibility polygons, based on https://www.redblobgames.com/articles/visibility/
+# Occluders are line segments, the light is bounded by a polygon around its radius so the sweep always has something
+# to hit. Cost depends on the number of segments near the light and not on an angular resolution.
+
+
+class _Segment:
+    __slots__ = ("p1", "p2")
+
+    def __init__(self, p1, p2):
+        self.p1 = p1
+        self.p2 = p2
+
+
+class _Endpoint:
+    __slots__ = ("x", "y", "angle", "begin", "segment")
+
+    def __init__(self, point, segment):
+        self.x, self.y = point
+        self.angle = 0
+        self.begin = False
+        self.segment = segment
+
+
+def rect_segments(rect):
+    left, top, right, bottom = rect.left, rect.top, rect.right, rect.bottom
+    return [
+        ((left, top), (right, top)),
+        ((right, top), (right, bottom)),
+        ((right, bottom), (left, bottom)),
+        ((left, bottom), (left, top))
+    ]
+
+
+def clip_segment(p1, p2, center, radius):
+    # Cuts a segment down to the part inside the circle, None if it misses the circle entirely
+    dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+    fx, fy = p1[0] - center[0], p1[1] - center[1]
+    a = dx * dx + dy * dy
+    if a == 0:
+        return None
+    b = 2 * (fx * dx + fy * dy)
+    c = fx * fx + fy * fy - radius * radius
+    discriminant = b * b - 4 * a * c
+    if discriminant <= 0:
+        return None
+    root = math.sqrt(discriminant)
+    t0 = max(0.0, (-b - root) / (2 * a))
+    t1 = min(1.0, (-b + root) / (2 * a))
+    if t0 >= t1:
+        return None
+    return (p1[0] + dx * t0, p1[1] + dy * t0), (p1[0] + dx * t1, p1[1] + dy * t1)
+
+
+def boundary_segments(center, radius, sides=48):
+    # A polygon around the circle (not inside it) so clipped occluders never cross the boundary
+    ring_radius = (radius + 1) / math.cos(math.pi / sides)
+    points = [(center[0] + math.cos(math.tau * i / sides) * ring_radius,
+               center[1] + math.sin(math.tau * i / sides) * ring_radius) for i in range(sides)]
+    return [(points[i], points[(i + 1) % sides]) for i in range(sides)]
+
+
+def occluder_segments(center, radius, occluders):
+    # Occluders are either outline segments (anything with p1 and p2) or objects whose whole rect blocks light
+    segments = []
+    for o in occluders:
+        if hasattr(o, "p1"):
+            edges = [(o.p1, o.p2)]
+        elif o.rect.collidepoint(center):
+            # A light inside a solid would be completely dark, so ignore whatever it sits in
+            continue
+        else:
+            edges = rect_segments(o.rect)
+        for p1, p2 in edges:
+            clipped = clip_segment(p1, p2, center, radius)
+            if clipped is not None:
+                segments.append(clipped)
+    return segments
+
+
+def _left_of(segment, x, y):
+    p1, p2 = segment.p1, segment.p2
+    return (p2[0] - p1[0]) * (y - p1[1]) - (p2[1] - p1[1]) * (x - p1[0]) < 0
+
+
+def _behind(a, b, center):
+    # True if segment a is known to be further from the center than segment b
+    b_near_1 = (b.p1[0] * 0.99 + b.p2[0] * 0.01, b.p1[1] * 0.99 + b.p2[1] * 0.01)
+    b_near_2 = (b.p2[0] * 0.99 + b.p1[0] * 0.01, b.p2[1] * 0.99 + b.p1[1] * 0.01)
+    a_near_1 = (a.p1[0] * 0.99 + a.p2[0] * 0.01, a.p1[1] * 0.99 + a.p2[1] * 0.01)
+    a_near_2 = (a.p2[0] * 0.99 + a.p1[0] * 0.01, a.p2[1] * 0.99 + a.p1[1] * 0.01)
+
+    a1 = _left_of(a, *b_near_1)
+    a2 = _left_of(a, *b_near_2)
+    a3 = _left_of(a, *center)
+    b1 = _left_of(b, *a_near_1)
+    b2 = _left_of(b, *a_near_2)
+    b3 = _left_of(b, *center)
+
+    if b1 == b2 and b2 != b3:
+        return True
+    if a1 == a2 and a2 == a3:
+        return True
+    return False
+
+
+def _intersect(p1, p2, p3, p4):
+    # Where the line through p1 and p2 crosses the line through p3 and p4
+    denominator = (p4[1] - p3[1]) * (p2[0] - p1[0]) - (p4[0] - p3[0]) * (p2[1] - p1[1])
+    if denominator == 0:
+        return p1
+    s = ((p4[0] - p3[0]) * (p1[1] - p3[1]) - (p4[1] - p3[1]) * (p1[0] - p3[0])) / denominator
+    return p1[0] + s * (p2[0] - p1[0]), p1[1] + s * (p2[1] - p1[1])
+
+
+def visibility_polygon(center, radius, segments, sides=48):
+    center = (center[0], center[1])
+    cx, cy = center
+
+    endpoints = []
+    for p1, p2 in [*segments, *boundary_segments(center, radius, sides)]:
+        # Segments pointing straight at the light have no width and can't block anything
+        if (p1[0] - cx) * (p2[1] - cy) - (p1[1] - cy) * (p2[0] - cx) == 0:
+            continue
+        segment = _Segment(p1, p2)
+        e1 = _Endpoint(p1, segment)
+        e2 = _Endpoint(p2, segment)
+        e1.angle = math.atan2(p1[1] - cy, p1[0] - cx)
+        e2.angle = math.atan2(p2[1] - cy, p2[0] - cx)
+
+        delta_angle = e2.angle - e1.angle
+        if delta_angle <= -math.pi:
+            delta_angle += math.tau
+        if delta_angle > math.pi:
+            delta_angle -= math.tau
+        e1.begin = delta_angle > 0
+        e2.begin = not e1.begin
+        endpoints.append(e1)
+        endpoints.append(e2)
+
+    # Sorted by angle, segments opening before others close at the same angle
+    endpoints.sort(key=lambda e: (e.angle, not e.begin))
+
+    open_segments = []
+    points = []
+    begin_angle = 0
+
+    # The first pass only opens the segments that wrap around the -pi/pi seam
+    for sweep in range(2):
+        for endpoint in endpoints:
+            old_nearest = open_segments[0] if open_segments else None
+
+            if endpoint.begin:
+                i = 0
+                while i < len(open_segments) and _behind(endpoint.segment, open_segments[i], center):
+                    i += 1
+                open_segments.insert(i, endpoint.segment)
+            elif endpoint.segment in open_segments:
+                open_segments.remove(endpoint.segment)
+
+            nearest = open_segments[0] if open_segments else None
+            if old_nearest is not nearest:
+                if sweep == 1 and old_nearest is not None:
+                    points.append(_intersect(old_nearest.p1, old_nearest.p2, center,
+                                             (cx + math.cos(begin_angle), cy + math.sin(begin_angle))))
+                    points.append(_intersect(old_nearest.p1, old_nearest.p2, center,
+                                             (cx + math.cos(endpoint.angle), cy + math.sin(endpoint.angle))))
+                begin_angle = endpoint.angle
+
+    return [pygame.Vector2(p) for p in points]
+
+
+def ray_directions(angle_step_size):
+    # Unit vectors starting straight down and rotating clockwise, matching Vector2(0, 1).rotate(angle)
+    angles = np.radians(np.arange(0, 360, angle_step_size))
+    return np.stack((-np.sin(angles), np.cos(angles)), axis=1)
+
+
+def cast_rays(origin, directions, distance, objects):
+    # Casts every ray against every object's rect at once with the slab test, returns the end point of each ray
+    # and a list per ray holding the object it hit (empty when it reached the full distance)
+    directions = np.asarray(directions, dtype=float)
+    ox, oy = origin[0], origin[1]
+
+    if not objects:
+        ends = directions * distance + (ox, oy)
+        return [pygame.Vector2(p) for p in ends.tolist()], [[] for _ in range(len(directions))]
+
+    rects = np.array([(o.rect.left, o.rect.top, o.rect.right, o.rect.bottom) for o in objects], dtype=float)
+
+    # Axis aligned rays never cross the slabs of the other axis, a tiny component keeps the maths finite
+    dx = np.where(directions[:, 0] == 0, 1e-12, directions[:, 0])[:, None]
+    dy = np.where(directions[:, 1] == 0, 1e-12, directions[:, 1])[:, None]
+
+    tx1 = (rects[:, 0] - ox) / dx
+    tx2 = (rects[:, 2] - ox) / dx
+    ty1 = (rects[:, 1] - oy) / dy
+    ty2 = (rects[:, 3] - oy) / dy
+
+    t_near = np.maximum(np.minimum(tx1, tx2), np.minimum(ty1, ty2))
+    t_far = np.minimum(np.maximum(tx1, tx2), np.maximum(ty1, ty2))
+    t_near = np.maximum(t_near, 0)
+
+    t = np.where((t_near <= t_far) & (t_near <= distance), t_near, np.inf)
+    nearest = np.argmin(t, axis=1)
+    hit_distance = t[np.arange(len(directions)), nearest]
+    hit = np.isfinite(hit_distance)
+
+    ends = directions * np.where(hit, hit_distance, distance)[:, None] + (ox, oy)
+    points = [pygame.Vector2(p) for p in ends.tolist()]
+    collided_objects = [[objects[i]] if h else [] for i, h in zip(nearest.tolist(), hit.tolist())]
+    return points, collided_objects
+
+
+class LightmapRenderer:
+    # Accumulates light polygons into a lightmap texture on the GPU. Lights are submitted as triangle fans around
+    # their position (every light polygon is star shaped around it) and blended premultiplied, so the lightmap can be
+    # laid over the frame the same way drawing the polygons onto it would have. Works with any moderngl context,
+    # including a standalone one.
+    def __init__(self, ctx, size, vert_path="shaders/light_vertex.glsl", frag_path="shaders/light_fragment.glsl"):
+        self.ctx = ctx
+        self.size = size
+        self.texture = ctx.texture(size, 4)
+        self.texture.filter = (moderngl.LINEAR, moderngl.LINEAR)
+        self.framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+
+        with open(vert_path, "r") as vert_file, open(frag_path, "r") as frag_file:
+            self.program = ctx.program(vertex_shader=vert_file.read(), fragment_shader=frag_file.read())
+        self.program["resolution"] = size
+
+        self.buffer = None
+        self.render_object = None
+        self.fans = []
+
+    def add(self, center, points, colour):
+        if len(points) < 3:
+            return
+        r, g, b, a = (c / 255 for c in colour)
+        self.fans.append((center, points, (r * a, g * a, b * a, a)))
+
+    def build_vertices(self):
+        vertices = []
+        for center, points, colour in self.fans:
+            points = np.asarray(points, dtype="f4")
+            count = len(points)
+            fan = np.empty((count * 3, 6), dtype="f4")
+            fan[0::3, :2] = (center[0], center[1])
+            fan[1::3, :2] = points
+            fan[2::3, :2] = np.roll(points, -1, axis=0)
+            fan[:, 2:] = colour
+            vertices.append(fan)
+        return np.concatenate(vertices)
+
+    def render(self):
+        previous_framebuffer = self.ctx.fbo
+        self.framebuffer.use()
+        self.framebuffer.clear(0, 0, 0, 0)
+
+        if self.fans:
+            vertices = self.build_vertices()
+            # The buffer only grows, so most frames just overwrite it
+            if self.buffer is None or self.buffer.size < vertices.nbytes:
+                if self.buffer is not None:
+                    self.render_object.release()
+                    self.buffer.release()
+                self.buffer = self.ctx.buffer(reserve=vertices.nbytes * 2, dynamic=True)
+                self.render_object = self.ctx.vertex_array(self.program, [(self.buffer, "2f 4f", "vert", "colour")])
+            self.buffer.write(vertices)
+
+            self.ctx.enable(moderngl.BLEND)
+            self.ctx.blend_func = moderngl.ONE, moderngl.ONE_MINUS_SRC_ALPHA
+            self.render_object.render(moderngl.TRIANGLES, vertices=len(vertices))
+            self.ctx.disable(moderngl.BLEND)
+            self.fans = []
+
+        if previous_framebuffer is not None:
+            previous_framebuffer.use()
+
+    def read(self):
+        # Lightmap as an (height, width, 4) array with row 0 at the top of the frame, mostly for testing
+        data = np.frombuffer(self.framebuffer.read(components=4), dtype=np.uint8)
+        return data.reshape(self.size[1], self.size[0], 4)
+
+    def release(self):
+        if self.buffer is not None:
+            self.render_object.release()
+            self.buffer.release()
+        self.framebuffer.release()
+        self.texture.release()
+        self.program.release()
@@ -1,3 +1,4 @@
+import numpy as np
 import pygame
 import pygame.geometry
 import moderngl
@@ -10,31 +11,63 @@ from typing import List
 import engine
 import engine.settings
 from engine.assetloader import Assets
+from engine.lighting import LightmapRenderer
+from engine.particles import Emitter, EmitterDefinition, load_emitters
+from engine.physics import SpatialHash
+from engine.rendering import LAYER_OVERLAY, LAYER_WORLD, RenderQueue, SpriteBatchRenderer, TransformCache
+from engine.triggers import Trigger, TriggerSystem
 import engine.util
 
 
 # Add a helper function for blitting
 def blit_surface(surface, pos):
-    engine.manager.engine.surface.blit(surface, pos + engine.manager.camera)
+    engine.manager.render_queue.blit(surface, pos + engine.manager.camera)
 
 
 class State:
+    cull_margin = 64  # Entities whose bounds are within this many px of the screen are still drawn and updated
+    static_tile_size = 256  # Static objects drawn over dynamic ones are baked into tiles this big
+    gpu_sprites = False  # Queued drawing goes to the GPU sprite batch when shaders are on, in the same order
+
     def __init__(self, manager):
         self.manager = manager
         self.objects = {}
         self.physics_objects = []
+        self.spatial_hash = SpatialHash()
+        self.triggers = TriggerSystem()
         self.background_colour = (0, 0, 0)
         self.buffered_objects = {}
+        self.static_layer = None
+        self.static_bounds = None
+        self.static_overlays = {}
 
     def add_object(self, name, obj):
         self.objects[name] = obj
+        if getattr(obj, "static", False):
+            self.invalidate_static_layer()
+
+        # Entities opt in to the trigger system with a trigger volume and/or a trigger layer to be detected on
+        trigger = getattr(obj, "trigger", None)
+        if trigger is not None:
+            self.triggers.add(trigger)
+        layer = getattr(obj, "trigger_layer", 0)
+        if layer:
+            self.triggers.add_actor(obj, layer)
 
     def add_buffered_object(self, name, obj):
         self.buffered_objects[name] = obj
 
     def add_phys_object(self, name, obj):
-        self.objects[name] = obj
+        self.add_object(name, obj)
+        self.add_collider(obj)
+
+    def add_collider(self, obj):
         self.physics_objects.append(obj)
+        self.spatial_hash.insert(obj)
+
+    def remove_collider(self, obj):
+        self.physics_objects.remove(obj)
+        self.spatial_hash.remove(obj)
 
     def on_focus(self):
         ...
@@ -50,15 +83,120 @@ class State:
     def on_init(self, *args):
         ...
 
-    def on_draw(self, surface):
-        surface.fill(self.background_colour)
+    def bake_static_layer(self, surface):
+        # Draws the background colour and every static object once, by pointing the engine's surface at the layer and
+        # the camera at the top left of the static bounds while they draw. Static objects added before the first
+        # dynamic one go on the base layer, every later run of them on a transparent overlay that is drawn in turn with
+        # the dynamic objects, so everything keeps the order it was added in. Overlays are kept as tiles cropped to
+        # what they cover, and tiles with no transparent pixels lose their alpha so they are plain copies to blit.
+        self.static_bounds = self.get_static_bounds(surface.get_size())
+        origin = pygame.Vector2(self.static_bounds.topleft)
+        self.static_layer = pygame.Surface(self.static_bounds.size, 0, surface)  # Same format without per pixel alpha
+        self.static_layer.fill(self.background_colour)
+        self.static_overlays = {}  # Name of the first object of a run -> [(tile, world position)]
+
+        runs = [[]]
+        for name, o in self.objects.items():
+            if not isinstance(o, engine.TickableEntity):
+                continue
+            if not o.static:
+                if runs[-1] or len(runs) == 1:
+                    runs.append([])
+            elif o.enabled:
+                runs[-1].append((name, o))
+
+        display_engine = engine.manager.engine
+        camera = pygame.Vector2(engine.manager.camera)
+        engine.manager.camera.update(-origin)
+        try:
+            self.draw_static(runs[0], self.static_layer)
+            for run in runs[1:]:
+                if not run:
+                    continue
+                overlay = pygame.Surface(self.static_bounds.size, pygame.SRCALPHA, 32)
+                self.draw_static(run, overlay)
+                tiles = [(tile, pos + origin) for tile, pos in self.crop_tiles(overlay)]
+                if tiles:
+                    self.static_overlays[run[0][0]] = tiles
+        finally:
+            display_engine.surface = surface
+            engine.manager.camera.update(camera)
+
+    def get_static_bounds(self, size):
+        # World rect covering the screen at the world origin and the bounds of every static object, so the layer holds
+        # the whole level however far the camera moves
+        bounds = pygame.Rect((0, 0), size)
         for o in self.objects.values():
-            if isinstance(o, engine.TickableEntity) and o.enabled:
+            if isinstance(o, engine.TickableEntity) and o.static and o.enabled:
+                rect = o.get_bounds()
+                if rect is not None:
+                    bounds.union_ip(rect)
+        return bounds
+
+    @staticmethod
+    def draw_static(objects, layer):
+        engine.manager.engine.surface = layer
+        for name, o in objects:
+            o.on_draw()
+        engine.manager.render_queue.flush(layer)
+
+    def crop_tiles(self, overlay):
+        tiles = []
+        width, height = overlay.get_size()
+        for y in range(0, height, self.static_tile_size):
+            for x in range(0, width, self.static_tile_size):
+                tile = overlay.subsurface(pygame.Rect(x, y, self.static_tile_size, self.static_tile_size).clip(
+                    overlay.get_rect()))
+                rect = tile.get_bounding_rect()
+                if not rect.width or not rect.height:
+                    continue
+                tile = tile.subsurface(rect).copy()
+                if pygame.surfarray.array_alpha(tile).min() == 255:
+                    opaque = pygame.Surface(rect.size, 0, 32)
+                    opaque.blit(tile, (0, 0))
+                    tile = opaque
+                tiles.append((tile, pygame.Vector2(x + rect.x, y + rect.y)))
+        return tiles
+
+    def invalidate_static_layer(self):
+        self.static_layer = None
+        self.static_bounds = None
+        self.static_overlays = {}
+
+    def get_cull_rect(self):
+        return engine.manager.get_view_rect().inflate(self.cull_margin * 2, self.cull_margin * 2)
+
+    @staticmethod
+    def is_visible(obj, cull_rect):
+        bounds = obj.get_bounds()
+        return bounds is None or cull_rect.colliderect(bounds)
+
+    def on_draw(self, surface):
+        if self.static_layer is None:
+            self.bake_static_layer(surface)
+        if not self.static_bounds.contains(engine.manager.get_view_rect()):
+            surface.fill(self.background_colour)  # Past the edge of the level there's only the background
+        # Straight onto the frame, under everything queued
+        surface.blit(self.static_layer, pygame.Vector2(self.static_bounds.topleft) + engine.manager.camera)
+        cull_rect = self.get_cull_rect()
+        for name, o in self.objects.items():
+            if not isinstance(o, engine.TickableEntity) or not o.enabled:
+                continue
+            if o.static:
+                tiles = self.static_overlays.get(name)
+                if tiles is not None:
+                    camera = engine.manager.camera
+                    engine.manager.render_queue.blits([(tile, pos + camera) for tile, pos in tiles])
+            elif self.is_visible(o, cull_rect):
                 o.on_draw()
+        display_engine = engine.manager.engine
+        sprite_batch = display_engine.sprite_batch if self.gpu_sprites and display_engine.gpu_sprites else None
+        engine.manager.render_queue.flush(surface, sprite_batch)
 
     def on_debug_draw(self, surface):
+        cull_rect = self.get_cull_rect()
         for o in self.objects.values():
-            if isinstance(o, engine.TickableEntity) and o.enabled:
+            if isinstance(o, engine.TickableEntity) and o.enabled and self.is_visible(o, cull_rect):
                 o.on_draw_debug()
 
     def on_event(self, event):
@@ -67,15 +205,21 @@ class State:
     def on_update(self):
         for k, v in self.buffered_objects.items():
             self.add_object(k, v)
+        self.buffered_objects = {}
 
+        cull_rect = self.get_cull_rect()
         for o in self.objects.values():
-            if isinstance(o, engine.TickableEntity) and o.enabled:
+            if isinstance(o, engine.TickableEntity) and o.enabled and (o.update_offscreen or
+                                                                       self.is_visible(o, cull_rect)):
                 o.update(self)
 
+        self.triggers.update(self)
+
     def on_quit(self):
         self.cleanup()
         self.objects = None
         self.physics_objects = None
+        self.spatial_hash = None
         self.manager.quit()
 
 
@@ -111,12 +255,16 @@ class StateMachine:
 
 
 class DisplayEngine:
-    def __init__(self, manager, caption, width, height, fps, flags):
+    def __init__(self, manager, caption, width, height, fps, flags, tick_rate=120):
         pygame.display.set_caption(caption)
         self.width, self.height = width, height
         self.shaders = engine.settings.getConfig().getboolean("graphics", "shaders")
         self.do_display_scaling = (width, height) != (1920, 1080)
         self.display = None
+        self.lightmap = None
+        self.sprite_batch = None
+        self.gpu_sprites = self.shaders and engine.settings.getConfig().getboolean("graphics", "gpu_sprites",
+                                                                                   fallback=True)
 
         if self.shaders:
             self.flags = flags | pygame.OPENGL | pygame.DOUBLEBUF
@@ -130,6 +278,17 @@ class DisplayEngine:
             self.display = pygame.display.set_mode((width, height), self.flags, 32)
             self.surface = pygame.Surface((width, height), self.flags, 32)
 
+        # Where the frame lands on the display: scaled to its width and centred, leaving bars above and below. The UI's
+        # mouse scaling in engine.run assumes the same.
+        scale = width / self.surface.get_width()
+        scaled_size = round(self.surface.get_width() * scale), round(self.surface.get_height() * scale)
+        self.viewport = pygame.Rect((0, (height - scaled_size[1]) // 2), scaled_size)
+        self.scaled_surface = None
+        self.frame_texture = None
+        self.ui_surface = None
+        self.ui_texture = None
+        self.ui_visible = False
+
         if self.shaders:
             self.ctx = moderngl.create_context()
             self.quad_buffer = self.ctx.buffer(data=array('f', [
@@ -140,10 +299,35 @@ class DisplayEngine:
             ]))
             self.program = self.loadShader("shaders/vertex.glsl", "shaders/fragment.glsl")
             self.render_object = self.ctx.vertex_array(self.program, [(self.quad_buffer, '2f 2f', 'vert', 'texcoord')])
+            self.lightmap = LightmapRenderer(self.ctx, self.surface.get_size())
+            self.sprite_batch = SpriteBatchRenderer(self.ctx, self.surface.get_size())
+
+            # One texture for the whole run, rewritten with each frame
+            self.frame_texture = self.ctx.texture(self.surface.get_size(), 4)
+            smooth = moderngl.LINEAR if self.do_display_scaling else moderngl.NEAREST
+            self.frame_texture.filter = (smooth, smooth)
+            self.frame_texture.swizzle = 'BGRA'
+
+            # Debug drawing and the UI go on their own transparent layer, laid over the frame after the lightmap
+            self.ui_surface = pygame.Surface(self.surface.get_size(), pygame.SRCALPHA, 32)
+            self.ui_texture = self.ctx.texture(self.surface.get_size(), 4)
+            self.ui_texture.filter = (smooth, smooth)
+            self.ui_texture.swizzle = 'BGRA'
+        elif self.do_display_scaling:
+            self.scaled_surface = pygame.Surface(self.viewport.size, 0, self.display)
 
         self.rect = self.surface.get_rect()
         self.clock = pygame.time.Clock()
         self.running = False
+
+        # The simulation runs at a fixed tick rate independent of the frame rate. delta is the fixed step while
+        # states update and the real frame time while they draw, alpha is how far the frame is between the previous
+        # and current simulation step so things can be drawn interpolated.
+        self.fixed_delta = 1 / tick_rate
+        self.max_frame_time = 0.25  # Frame spikes longer than this are dropped instead of simulated
+        self.accumulator = 0
+        self.alpha = 0
+        self.frame_delta = 0
         self.delta = 0
         self.delta_counter = engine.Text((35, 65), "Delta: error", 24)
         self.time = 0
@@ -158,12 +342,37 @@ class DisplayEngine:
             vert, frag = vert_file.read(), frag_file.read()
         return self.ctx.program(vertex_shader=vert, fragment_shader=frag)
 
-    def surf_to_texture(self, surf: pygame.Surface):
-        tex = self.ctx.texture(surf.get_size(), 4)
-        tex.filter = (moderngl.NEAREST, moderngl.NEAREST)
-        tex.swizzle = 'BGRA'
-        tex.write(surf.get_view('1'))
-        return tex
+    def present(self):
+        if self.shaders:
+            self.lightmap.render()
+            self.sprite_batch.render()
+            self.frame_texture.write(self.surface.get_view('1'))
+
+            self.ctx.screen.use()
+            if self.do_display_scaling:
+                self.ctx.clear(0, 0, 0)
+            # Viewports count up from the bottom of the window
+            self.ctx.viewport = (self.viewport.x, self.height - self.viewport.bottom, *self.viewport.size)
+
+            if self.ui_visible:
+                self.ui_texture.write(self.ui_surface.get_view('1'))
+
+            self.frame_texture.use(0)
+            self.lightmap.texture.use(1)
+            self.sprite_batch.texture.use(2)
+            self.ui_texture.use(3)
+            self.program['tex'] = 0
+            self.program['lightmap'] = 1
+            self.program['sprites'] = 2
+            self.program['ui'] = 3
+            self.program['ui_visible'] = self.ui_visible
+            self.program['colour_correction'] = (1, 1, 1.1)
+            self.render_object.render(mode=moderngl.TRIANGLE_STRIP)
+        elif self.do_display_scaling:
+            pygame.transform.scale(self.surface, self.viewport.size, self.scaled_surface)
+            self.display.blit(self.scaled_surface, self.viewport)
+
+        pygame.display.flip()
 
     def loop(self, state=None):
         self.running = True
@@ -183,37 +392,47 @@ class DisplayEngine:
                     elif event.key == pygame.K_F6:
                         print("Reloading assets...")
                         engine.manager.reloadAssets()
+                        state.invalidate_static_layer()
                 state.on_event(event)
                 self.manager.ui_manager.process_events(event)
 
-            state.on_update()
+            self.accumulator += self.frame_delta
+            self.delta = self.fixed_delta
+            while self.accumulator >= self.fixed_delta:
+                state.on_update()
+                self.accumulator -= self.fixed_delta
+                if self.state_machine.next_state:  # Don't keep simulating a state that is being left
+                    self.accumulator = 0
+                    break
+            self.alpha = self.accumulator / self.fixed_delta
+            self.delta = self.frame_delta
+
             state.on_draw(self.surface)
 
+            # With shaders, debug drawing and the UI are pointed at the UI layer so they stay clear of the lighting.
+            # Levels usually have nothing in the UI besides its root container, and then the layer is left out.
+            frame = self.surface
+            self.ui_visible = engine.debug or len(self.manager.ui_manager.get_sprite_group().sprites()) > 1
+            if self.shaders and self.ui_visible:
+                self.ui_surface.fill((0, 0, 0, 0))
+                self.surface = self.ui_surface
+
             if engine.debug:
                 state.on_debug_draw(self.surface)
                 self.fps_counter.text = f"FPS: {int(self.clock.get_fps())}"
-                self.delta_counter.text = f"Delta: {self.delta}"
-                self.fps_counter.update()
-                self.delta_counter.update()
+                self.delta_counter.text = f"Delta: {self.frame_delta}"
+                self.fps_counter.on_draw()
+                self.delta_counter.on_draw()
+            self.manager.render_queue.flush(self.surface)
 
             self.manager.ui_manager.update(self.delta)
             self.manager.ui_manager.draw_ui(self.surface)
+            self.surface = frame
 
-            if self.do_display_scaling:
-                scaled_surf = pygame.transform.scale_by(self.surface, self.display.get_width() / 1920)
-                self.display.blit(scaled_surf, (0, (self.display.get_height() - scaled_surf.get_height()) / 2))
-            elif self.shaders:
-                frame_tex = self.surf_to_texture(self.surface)
-                frame_tex.use(0)
-                self.program['tex'] = 0
-                self.program['colour_correction'] = (1, 1, 1.1)
-                self.render_object.render(mode=moderngl.TRIANGLE_STRIP)
-                frame_tex.release()
-
-            pygame.display.flip()
+            self.present()
 
-            self.delta = (self.clock.tick(self.fps) / 1000)
-            self.time += self.delta
+            self.frame_delta = min(self.clock.tick(self.fps) / 1000, self.max_frame_time)
+            self.time += self.frame_delta
 
         engine.join_all_threads()
 
@@ -278,11 +497,12 @@ class MusicManager:
 
 # Store what to be share across all states
 class Manager:
-    def __init__(self, caption, width, height, fps=60, flags=0):
-        self.engine = DisplayEngine(self, caption, width, height, fps, flags)
+    def __init__(self, caption, width, height, fps=60, flags=0, tick_rate=120):
+        self.engine = DisplayEngine(self, caption, width, height, fps, flags, tick_rate)
         self.ui_manager = None
         self.controls = {}
         self.camera = pygame.Vector2()
+        self.render_queue = RenderQueue()
         self.assets = Assets()
         self.globals = {}
         self.music = MusicManager()
@@ -293,14 +513,16 @@ class Manager:
     def delta(self):
         return self.engine.delta
 
-    def blit(self, surf, pos):
-        self.engine.surface.blit(surf, pos + self.camera)
+    def get_view_rect(self):
+        # The part of the world that is on screen
+        return pygame.Rect(-self.camera, self.engine.surface.get_size())
 
-    def blit_center(self, surf, pos_):
-        pos = pygame.Vector2(pos_)
-        self.engine.surface.blit(surf,
-                                 (pos.x - surf.get_width() / 2 + self.camera.x,
-                                  pos.y - surf.get_height() / 2 + self.camera.y))
+    def blit(self, surf, pos, layer=LAYER_WORLD, z=0):
+        self.render_queue.blit(surf, pos + self.camera, layer, z)
+
+    def blit_center(self, surf, pos, layer=LAYER_WORLD, z=0):
+        width, height = surf.get_size()
+        self.render_queue.blit(surf, (pos[0] - width / 2 + self.camera.x, pos[1] - height / 2 + self.camera.y), layer, z)
 
     @staticmethod
     def change_caption(caption):
@@ -340,12 +562,25 @@ class Manager:
 
 class TickableEntity:
     enabled = True
+    static = False  # Never changes how it looks or where, so it's drawn once into the state's static layer
+    update_offscreen = True  # False skips update while get_bounds is off-screen
+
+    def get_bounds(self):
+        # World rect everything the entity draws fits in, None when unknown so it's never culled
+        return getattr(self, "rect", None)
+
     def update(self, *args): ...
 
     def on_draw(self, *args): ...
 
     def on_draw_debug(self, *args): ...
 
+    def on_trigger_enter(self, *args): ...
+
+    def on_trigger_stay(self, *args): ...
+
+    def on_trigger_exit(self, *args): ...
+
     def kill(self): ...
 
 
@@ -359,35 +594,148 @@ class Sprite(TickableEntity):
     def on_draw(self, *args):
         engine.manager.blit(engine.manager.assets.get(self.image), self.pos)
 
+    def get_bounds(self):
+        return pygame.Rect(self.pos, engine.manager.assets.get(self.image).get_size())
+
 
 class ParticleManager(TickableEntity):
-    def __init__(self):
-        self.particles = []
+    # Live particles are kept packed at the front of fixed size arrays. New particles wait in pending until the next
+    # update (so callers can still set their rates and gravity after adding them), and dead ones are swapped out with
+    # live ones from the end, so nothing is ever shifted or allocated per particle. Emitters write straight into the
+    # arrays; their cosmetic spawns are cut down once budget particles are alive or step_budget have spawned this step.
+    def __init__(self, capacity=4096, budget=1024, step_budget=128):
+        self.capacity = capacity
+        self.budget = budget
+        self.step_budget = step_budget
+        self.spawn_budget = step_budget
+        self.count = 0
+        self.pending = []
+
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.gravity = np.zeros((capacity, 2))
+        self.scale = np.zeros(capacity)
+        self.scale_per_second = np.zeros(capacity)
+        self.rotation = np.zeros(capacity)
+        self.rotation_per_second = np.zeros(capacity)
+        self.image_index = np.zeros(capacity, dtype=int)
+
+        self.images = []  # Surfaces referenced by image_index
+        self.image_indices = {}  # Surface -> index into images
+        self.image_sizes = np.zeros((0, 2))
 
     def serialize(self):
-        self.particles = []
+        self.count = 0
+        self.pending = []
+        self.images = []
+        self.image_indices = {}
+        self.image_sizes = np.zeros((0, 2))
 
     def addParticle(self, *args):
         particle = Particle(*args)
-        self.particles.append(particle)
+        self.pending.append(particle)
         return particle
 
     def addDefinedParticle(self, particle):
-        self.particles.append(particle)
+        self.pending.append(particle)
         return particle
 
-    def on_draw(self, *args):
-        kill_list = []
-        for p in self.particles:
-            p.update()
-            if p.kill:
-                kill_list.append(p)
+    def emit(self, definition, pos, count=None):
+        if count is None:
+            count = definition.burst
+        if definition.cosmetic:
+            count = min(count, self.budget - self.count, self.spawn_budget)
+        count = min(count, self.capacity - self.count)
+        image_indices = [self.get_image_index(image) for image in map(engine.get_asset, definition.images)
+                         if image is not None]
+        if count <= 0 or not image_indices:
+            return 0
+        if definition.cosmetic:
+            self.spawn_budget -= count
+
+        def uniform(value_range):
+            low, high = np.asarray(value_range, dtype=float).T
+            return np.random.uniform(low, high, (count,) + low.shape)
+
+        s = slice(self.count, self.count + count)
+        self.pos[s] = tuple(pos)
+        self.vel[s] = uniform(definition.velocity)
+        self.gravity[s] = uniform(definition.gravity)
+        self.scale[s] = uniform(definition.scale)
+        self.scale_per_second[s] = uniform(definition.scale_per_second)
+        self.rotation[s] = uniform(definition.rotation)
+        self.rotation_per_second[s] = uniform(definition.rotation_per_second)
+        self.image_index[s] = np.random.choice(image_indices, count)
+        self.count += count
+        return count
+
+    def get_image_index(self, image):
+        index = self.image_indices.get(image)
+        if index is None:
+            index = self.image_indices[image] = len(self.images)
+            self.images.append(image)
+            self.image_sizes = np.vstack((self.image_sizes, image.get_size()))
+        return index
+
+    def add_pending(self):
+        for p in self.pending:
+            if self.count >= self.capacity or p.image is None:
+                continue
+            i = self.count
+            self.pos[i] = p.pos
+            self.vel[i] = p.vel
+            self.gravity[i] = p.gravity
+            self.scale[i] = p.scale
+            self.scale_per_second[i] = p.scale_per_second
+            self.rotation[i] = p.rotation
+            self.rotation_per_second[i] = p.rotation_per_second
+            self.image_index[i] = self.get_image_index(p.image)
+            self.count += 1
+        self.pending = []
+
+    def remove(self, dead):
+        # Swap remove, the holes left below the new count are filled with the live particles above it
+        count = self.count - len(dead)
+        holes = dead[dead < count]
+        alive_above = np.setdiff1d(np.arange(count, self.count), dead, assume_unique=True)
+        for array in (self.pos, self.vel, self.gravity, self.scale, self.scale_per_second, self.rotation,
+                      self.rotation_per_second, self.image_index):
+            array[holes] = array[alive_above]
+        self.count = count
+
+    def update(self, *args):
+        self.spawn_budget = self.step_budget
+        if self.pending:
+            self.add_pending()
+        n = self.count
+        if not n:
+            return
 
-        for p in kill_list:  # particles added to separate list to delete to prevent flickering.
-            self.particles.remove(p)
+        delta = engine.manager.engine.delta
+        self.rotation[:n] += self.rotation_per_second[:n] * delta
+        self.scale[:n] += self.scale_per_second[:n] * delta
+        self.vel[:n] += self.gravity[:n] * delta
+        self.pos[:n] += self.vel[:n] * delta
+
+        # Gone once shrunk away or fallen below the screen
+        angle = np.radians(self.rotation[:n])
+        width, height = self.image_sizes[self.image_index[:n]].T
+        rotated_height = (np.abs(width * np.sin(angle)) + np.abs(height * np.cos(angle))) * self.scale[:n]
+        dead = (self.scale[:n] <= 0) | (self.pos[:n, 1] > engine.manager.engine.surface.get_height() + rotated_height / 2)
+        if dead.any():
+            self.remove(np.flatnonzero(dead))
+
+    def on_draw(self, *args):
+        n = self.count
+        if not n:
+            return
+        camera = engine.manager.camera
+        engine.manager.render_queue.instances(self.images, self.image_index[:n], self.pos[:n] + (camera.x, camera.y),
+                                              self.scale[:n], self.rotation[:n])
 
 
 class Particle:
+    # Describes a particle to spawn, ParticleManager copies it into its arrays on the next update
     def __init__(self, image, pos, vel=(0, 0), scale=1):
         self.image = image
         self.pos = pygame.Vector2(pos)
@@ -398,22 +746,6 @@ class Particle:
         self.rotation_per_second = 0
         self.gravity = pygame.Vector2()
 
-        self.kill = False
-
-    def update(self):
-        self.rotation += self.rotation_per_second * engine.manager.engine.delta
-        self.scale += self.scale_per_second * engine.manager.engine.delta
-        if self.scale <= 0:
-            self.scale = 0.001
-            self.kill = True
-        image = pygame.transform.scale_by(self.image, self.scale)
-        image = pygame.transform.rotate(image, self.rotation)
-        engine.manager.blit_center(image, self.pos)
-        self.vel += self.gravity * engine.delta()
-        self.pos += self.vel * engine.delta()
-        if self.pos.y > engine.manager.engine.surface.get_height() + image.get_height() / 2:
-            self.kill = True
-
 
 class Animation(TickableEntity):
     def __init__(self, path, frame_delay=0.075, pos=None, kill_on_finish=False):
@@ -498,11 +830,14 @@ class Text(TickableEntity):
         self.font: pygame.Font = pygame.font.SysFont(font, size)
         self.text = text
         self.rendered_text = self.font.render(self.text, False, (255, 255, 255))
+        self.rendered_string = self.text
 
-    def update(self, *args):
-        surf = engine.manager.engine.surface
-        self.rendered_text = self.font.render(self.text, False, (255, 255, 255))
-        surf.blit(self.rendered_text, self.pos)
+    def on_draw(self, *args):
+        # Only re-render when the text changed, the same surface also keeps its spot in the sprite atlas
+        if self.text != self.rendered_string:
+            self.rendered_text = self.font.render(self.text, False, (255, 255, 255))
+            self.rendered_string = self.text
+        engine.manager.render_queue.blit(self.rendered_text, self.pos, LAYER_OVERLAY)
 
 
 class SliceSprite(pygame.sprite.Sprite):  # Stolen from the internet
@@ -658,8 +993,17 @@ class SliceSprite(pygame.sprite.Sprite):  # Stolen from the internet
             self._regenerate_slices = False
         surface.blit(self._sliced_image, (x, y))
 
-def linecast(start_pos, direction, distance, collidable_objects, distance_threshold=1):
+def linecast(start_pos, direction, distance, collidable_objects, distance_threshold=1, tile_grid=None):
     direction.normalize_ip()
+
+    # Static geometry is walked tile by tile through the grid, only the remaining objects need to be marched against
+    grid_hit_pos, grid_hit_object = None, None
+    if tile_grid is not None:
+        grid_hit_pos, grid_hit_object, _ = tile_grid.raycast(start_pos, direction, distance)
+        distance = grid_hit_pos.distance_to(start_pos)
+        if not collidable_objects:
+            return grid_hit_pos, [grid_hit_object] if grid_hit_object is not None else []
+
     pos = pygame.Vector2(start_pos)
     distance_marched = 0
 
@@ -685,4 +1029,7 @@ def linecast(start_pos, direction, distance, collidable_objects, distance_thresh
                 pos.normalize_ip()
                 pos *= distance
                 pos += start_pos
+
+    if not collided_objects and grid_hit_object is not None:
+        return grid_hit_pos, [grid_hit_object]
     return pos, collided_objects
@@ -0,0 +1,51 @@
+import json
+
+
+class EmitterDefinition:
+    # What an emitter spawns. Every range is a [min, max] pair picked from uniformly per particle, velocity and gravity
+    # take one pair per axis. Cosmetic emitters are the first to be dropped when the particle budget runs low.
+    def __init__(self, images, burst=0, rate=0, velocity=((-100, 100), (-100, 100)), gravity=((0, 0), (0, 0)),
+                 scale=(1, 1), scale_per_second=(-9, -2), rotation=(0, 0), rotation_per_second=(-90, 90),
+                 cosmetic=True):
+        self.images = [images] if isinstance(images, str) else list(images)  # Asset names
+        self.burst = burst
+        self.rate = rate  # Particles per second while an Emitter is running
+        self.velocity = velocity
+        self.gravity = gravity
+        self.scale = scale
+        self.scale_per_second = scale_per_second
+        self.rotation = rotation
+        self.rotation_per_second = rotation_per_second
+        self.cosmetic = cosmetic
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class Emitter:
+    # Spawns a definition's rate per second of simulated time, carrying the fraction left over between steps so the
+    # amount spawned doesn't depend on how often update is called
+    def __init__(self, definition):
+        self.definition = definition
+        self.accumulator = 0
+
+    def reset(self):
+        self.accumulator = 0
+
+    def burst(self, manager, pos, count=None):
+        return manager.emit(self.definition, pos, count)
+
+    def update(self, manager, pos, delta):
+        self.accumulator += self.definition.rate * delta
+        count = int(self.accumulator)
+        if not count:
+            return 0
+        self.accumulator -= count
+        return manager.emit(self.definition, pos, count)
+
+
+def load_emitters(path):
+    with open(path) as file:
+        data = json.loads(file.read())
+    return {name: EmitterDefinition.from_dict(definition) for name, definition in data.items()}
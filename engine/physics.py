@@ -0,0 +1,481 @@
+from array import array
+import math
+
+import pygame
+
+
+class SpatialHash:
+    # Uniform grid broadphase. Objects are stored in every cell their rect covers, so a query only has to test the
+    # handful of objects near the probe instead of everything in the scene.
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.object_cells = {}  # object -> (x0, y0, x1, y1) cell range it is currently stored in
+
+    def __len__(self):
+        return len(self.object_cells)
+
+    def __contains__(self, obj):
+        return obj in self.object_cells
+
+    def cell_range(self, rect):
+        # Zero width or height rects (like outline segments) still go in the cell they sit in
+        cell_size = self.cell_size
+        return (rect.left // cell_size, rect.top // cell_size,
+                max(rect.right - 1, rect.left) // cell_size, max(rect.bottom - 1, rect.top) // cell_size)
+
+    def _add_to_cells(self, obj, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = cell = {}
+                cell[obj] = None  # dict rather than set so iteration order is insertion order
+
+    def _remove_from_cells(self, obj, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    continue
+                cell.pop(obj, None)
+                if not cell:
+                    del cells[(cx, cy)]
+
+    def insert(self, obj):
+        if obj in self.object_cells:
+            self.update(obj)
+            return
+        cell_range = self.cell_range(obj.rect)
+        self.object_cells[obj] = cell_range
+        self._add_to_cells(obj, cell_range)
+
+    def remove(self, obj):
+        cell_range = self.object_cells.pop(obj, None)
+        if cell_range is not None:
+            self._remove_from_cells(obj, cell_range)
+
+    def update(self, obj):
+        # Called by moving bodies after they move, only touches the grid when the covered cells actually change
+        old_range = self.object_cells.get(obj)
+        if old_range is None:
+            self.insert(obj)
+            return
+        new_range = self.cell_range(obj.rect)
+        if new_range == old_range:
+            return
+        self._remove_from_cells(obj, old_range)
+        self._add_to_cells(obj, new_range)
+        self.object_cells[obj] = new_range
+
+    def clear(self):
+        self.cells = {}
+        self.object_cells = {}
+
+    def query(self, rect):
+        # Every object stored in the cells the rect covers (broadphase only, the rects might not actually overlap)
+        x0, y0, x1, y1 = self.cell_range(rect)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            return list(cells.get((x0, y0), ()))
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return list(found)
+
+    def collide(self, rect, ignore=None):
+        # First object whose rect overlaps the given rect, or None
+        for o in self.query(rect):
+            if o is not ignore and rect.colliderect(o.rect):
+                return o
+        return None
+
+    def collide_all(self, rect, ignore=None):
+        return [o for o in self.query(rect) if o is not ignore and rect.colliderect(o.rect)]
+
+
+class Segment:
+    # A straight piece of a tile outline, rect is its bounds (zero thickness) so it can live in a SpatialHash
+    def __init__(self, p1, p2):
+        self.p1 = p1
+        self.p2 = p2
+        self.rect = pygame.Rect(min(p1[0], p2[0]), min(p1[1], p2[1]), abs(p2[0] - p1[0]), abs(p2[1] - p1[1]))
+
+
+class TileGrid:
+    # Compact copy of a level's tile layout. Tiles are stored as one byte each (an index into self.types) and a summed
+    # area table over solid tiles makes point and rect solidity checks constant time.
+    def __init__(self, width, height, tile_size, types=(None,)):
+        self.width = width
+        self.height = height
+        self.tile_size = pygame.Vector2(tile_size)
+        self.types = list(types)  # tile code -> platform type, code 0 is always empty
+        self.tiles = bytearray(width * height)
+        self.owners = [None] * (width * height)  # tile -> batch object covering it
+        self.objects = {}  # every batch object registered with add_owner
+        self.solid_area = array("i", bytes(4 * (width + 1) * (height + 1)))
+        self.outline_segments = None  # SpatialHash of Segments, built on first use by outline()
+
+    @classmethod
+    def from_layout(cls, layout, level_ids, tile_size):
+        types = [None]
+        for t in level_ids.values():
+            if t is not None and t not in types:
+                types.append(t)
+        codes = {char: types.index(t) for char, t in level_ids.items()}
+
+        grid = cls(max((len(row) for row in layout), default=0), len(layout), tile_size, types)
+        tiles = grid.tiles
+        for y, row in enumerate(layout):
+            offset = y * grid.width
+            for x, char in enumerate(row):
+                tiles[offset + x] = codes[char]
+        grid.build_solid_area()
+        return grid
+
+    def build_solid_area(self):
+        width, height = self.width, self.height
+        stride = width + 1
+        area = self.solid_area
+        tiles = self.tiles
+        for y in range(height):
+            row_total = 0
+            for x in range(width):
+                row_total += tiles[y * width + x] != 0
+                area[(y + 1) * stride + x + 1] = area[y * stride + x + 1] + row_total
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.tiles[y * self.width + x]
+        return 0
+
+    def get_type(self, x, y):
+        return self.types[self.get(x, y)]
+
+    def is_solid(self, x, y):
+        return self.get(x, y) != 0
+
+    def owner_at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.owners[y * self.width + x]
+        return None
+
+    def world_to_tile(self, pos):
+        return int(pos[0] // self.tile_size.x), int(pos[1] // self.tile_size.y)
+
+    def is_solid_point(self, pos):
+        return self.is_solid(*self.world_to_tile(pos))
+
+    def count_solid(self, x0, y0, x1, y1):
+        # Number of solid tiles in the inclusive tile range, clipped to the grid
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width - 1), min(y1, self.height - 1)
+        if x1 < x0 or y1 < y0:
+            return 0
+        stride = self.width + 1
+        area = self.solid_area
+        return (area[(y1 + 1) * stride + x1 + 1] - area[y0 * stride + x1 + 1]
+                - area[(y1 + 1) * stride + x0] + area[y0 * stride + x0])
+
+    def is_solid_rect(self, rect):
+        rect = pygame.Rect(rect)
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+        tile_w, tile_h = self.tile_size
+        return self.count_solid(int(rect.left // tile_w), int(rect.top // tile_h),
+                                int((rect.right - 1) // tile_w), int((rect.bottom - 1) // tile_h)) > 0
+
+    def outline(self):
+        # Only edges between a solid and an empty tile can ever cast a shadow, collinear neighbours are joined into
+        # one segment. Built once and kept (and pickled) with the grid.
+        if self.outline_segments is not None:
+            return self.outline_segments
+
+        tile_w, tile_h = self.tile_size
+        is_solid = self.is_solid
+        segments = SpatialHash()
+
+        for y in range(self.height + 1):
+            start = None
+            for x in range(self.width + 1):
+                edge = x < self.width and is_solid(x, y - 1) != is_solid(x, y)
+                if edge and start is None:
+                    start = x
+                elif not edge and start is not None:
+                    segments.insert(Segment((start * tile_w, y * tile_h), (x * tile_w, y * tile_h)))
+                    start = None
+
+        for x in range(self.width + 1):
+            start = None
+            for y in range(self.height + 1):
+                edge = y < self.height and is_solid(x - 1, y) != is_solid(x, y)
+                if edge and start is None:
+                    start = y
+                elif not edge and start is not None:
+                    segments.insert(Segment((x * tile_w, start * tile_h), (x * tile_w, y * tile_h)))
+                    start = None
+
+        self.outline_segments = segments
+        return segments
+
+    def add_owner(self, obj):
+        # Registers a batch object as the owner of the tiles its rect covers, so raycasts can report what they hit
+        tile_w, tile_h = self.tile_size
+        rect = obj.rect
+        self.objects[obj] = None
+        for y in range(max(int(rect.top // tile_h), 0), min(int((rect.bottom - 1) // tile_h) + 1, self.height)):
+            for x in range(max(int(rect.left // tile_w), 0), min(int((rect.right - 1) // tile_w) + 1, self.width)):
+                self.owners[y * self.width + x] = obj
+
+    def raycast(self, start_pos, direction, distance):
+        # Amanatides-Woo grid traversal, visits each tile the ray passes through once.
+        # Returns (end position, object hit or None, tile hit or None). direction must be normalised.
+        tile_w, tile_h = self.tile_size
+        start_x, start_y = start_pos
+        dir_x, dir_y = direction
+        x, y = int(start_x // tile_w), int(start_y // tile_h)
+
+        if dir_x > 0:
+            step_x, t_delta_x = 1, tile_w / dir_x
+            t_max_x = ((x + 1) * tile_w - start_x) / dir_x
+        elif dir_x < 0:
+            step_x, t_delta_x = -1, tile_w / -dir_x
+            t_max_x = (x * tile_w - start_x) / dir_x
+        else:
+            step_x, t_delta_x, t_max_x = 0, math.inf, math.inf
+
+        if dir_y > 0:
+            step_y, t_delta_y = 1, tile_h / dir_y
+            t_max_y = ((y + 1) * tile_h - start_y) / dir_y
+        elif dir_y < 0:
+            step_y, t_delta_y = -1, tile_h / -dir_y
+            t_max_y = (y * tile_h - start_y) / dir_y
+        else:
+            step_y, t_delta_y, t_max_y = 0, math.inf, math.inf
+
+        width, height = self.width, self.height
+        tiles = self.tiles
+        t = 0
+        while t <= distance:
+            if 0 <= x < width and 0 <= y < height:
+                if tiles[y * width + x]:
+                    return (pygame.Vector2(start_x + dir_x * t, start_y + dir_y * t),
+                            self.owners[y * width + x], (x, y))
+            elif (x < 0 and step_x <= 0) or (x >= width and step_x >= 0) or \
+                    (y < 0 and step_y <= 0) or (y >= height and step_y >= 0):
+                break  # Left the grid and can never come back
+            if t_max_x < t_max_y:
+                t = t_max_x
+                t_max_x += t_delta_x
+                x += step_x
+            else:
+                t = t_max_y
+                t_max_y += t_delta_y
+                y += step_y
+
+        return pygame.Vector2(start_x + dir_x * distance, start_y + dir_y * distance), None, None
+
+
+class KinematicBody:
+    # Collision routine shared by everything that moves. pos is the owner's own position vector and, like the hitbox and
+    # probe rects, is updated in place so the owner can hold on to references to them.
+    # Movement is swept one axis at a time against everything in the spatial hash between the start and end positions,
+    # so fast bodies stop at the first surface they would reach instead of tunnelling through it.
+    def __init__(self, owner, pos, size, offset=(0, 0), hitbox_depth=4):
+        self.owner = owner
+        self.pos = pos
+        self.previous_pos = pygame.Vector2(pos)  # Position at the start of the current step, for interpolation
+        self.size = pygame.Vector2(size)
+        self.offset = pygame.Vector2(offset)
+        self.hitbox_depth = hitbox_depth
+
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.check_box_bottom = pygame.Rect(0, 0, 0, 0)
+        self.check_box_right = pygame.Rect(0, 0, 0, 0)
+        self.check_box_left = pygame.Rect(0, 0, 0, 0)
+        self.check_box_top = pygame.Rect(0, 0, 0, 0)
+
+        self.touching_top = None
+        self.touching_bottom = None
+        self.touching_right = None
+        self.touching_left = None
+
+        self.contacts = []  # (normal, object) for every surface hit during the last move
+
+        # Bodies that have been still with the same contacts for sleep_steps steps stop simulating until something
+        # touches them or the ground under them changes. Sleeping bodies stay in the spatial hash as obstacles.
+        self.can_sleep = False
+        self.sleeping = False
+        self.sleep_steps = 30
+        self.sleep_speed = 1
+        self.still_steps = 0
+        self.last_contacts = None
+        self.ground_rect = None
+
+        self.update_bounds()
+
+    def update_bounds(self):
+        x = self.pos.x + self.offset.x
+        y = self.pos.y + self.offset.y
+        width, height = self.size
+        depth = self.hitbox_depth
+        self.rect.update(x, y, width, height)
+        self.check_box_bottom.update(x, y + height, width, depth)
+        self.check_box_right.update(x + width, y, depth, height)
+        self.check_box_left.update(x - depth, y, depth, height)
+        self.check_box_top.update(x, y - depth, width, depth)
+
+    def interpolated_pos(self, alpha):
+        return self.previous_pos.lerp(self.pos, alpha)
+
+    def snap_interpolation(self):
+        # Call after teleporting the body so it isn't drawn sliding from its old position
+        self.previous_pos.update(self.pos)
+
+    def probe(self, spatial_hash, snap=True):
+        # Starts a simulation step. Finds what the body is resting against on each side, when snap is set the body is
+        # pulled flush onto whatever is under it.
+        owner = self.owner
+        self.previous_pos.update(self.pos)
+
+        self.touching_bottom = spatial_hash.collide(self.check_box_bottom, owner)
+        if self.touching_bottom is not None and snap:
+            self.pos.y -= self.check_box_bottom.y - self.touching_bottom.rect.y
+            self.update_bounds()
+
+        self.touching_top = spatial_hash.collide(self.check_box_top, owner)
+        self.touching_left = spatial_hash.collide(self.check_box_left, owner)
+        self.touching_right = spatial_hash.collide(self.check_box_right, owner)
+
+        # Leaning on a sleeping body from the side wakes it so it can be pushed, standing on top of one doesn't
+        wake_body(self.touching_left)
+        wake_body(self.touching_right)
+
+    def clip_velocity(self, vel):
+        # Stops a velocity from pushing into any of the surfaces found by the last probe
+        if self.touching_bottom is not None:
+            vel.y = min(vel.y, 0)
+        if self.touching_top is not None:
+            vel.y = max(vel.y, 0)
+        if self.touching_left is not None:
+            vel.x = max(vel.x, 0)
+        if self.touching_right is not None:
+            vel.x = min(vel.x, 0)
+
+    def move(self, displacement, spatial_hash, *velocities):
+        # Moves by displacement, stopping at the time of impact on each axis. Any velocities passed in are clipped
+        # against the surfaces hit. Returns the contacts made as (normal, object) pairs.
+        self.contacts.clear()
+        dx, dy = displacement
+        if dx:
+            self._sweep(0, dx, spatial_hash, velocities)
+        if dy:
+            self._sweep(1, dy, spatial_hash, velocities)
+        self.update_bounds()
+        spatial_hash.update(self.owner)
+        return self.contacts
+
+    def _sweep(self, axis, distance, spatial_hash, velocities):
+        other = 1 - axis
+        start = self.pos[axis] + self.offset[axis]
+        end = start + self.size[axis]
+        side_start = self.pos[other] + self.offset[other]
+        side_end = side_start + self.size[other]
+
+        if axis == 0:
+            swept = pygame.Rect(min(start, start + distance), side_start, self.size.x + abs(distance), self.size.y)
+        else:
+            swept = pygame.Rect(side_start, min(start, start + distance), self.size.x, self.size.y + abs(distance))
+        swept.inflate_ip(2, 2)
+
+        hit = None
+        travel = abs(distance)
+        for o in spatial_hash.query(swept):
+            if o is self.owner:
+                continue
+            rect = o.rect
+            if axis == 0:
+                near, far, o_side_start, o_side_end = rect.left, rect.right, rect.top, rect.bottom
+            else:
+                near, far, o_side_start, o_side_end = rect.top, rect.bottom, rect.left, rect.right
+            if o_side_start >= side_end or o_side_end <= side_start:
+                continue  # Not in the way on this axis
+
+            gap = near - end if distance > 0 else start - far
+            if gap < -1:
+                continue  # Already overlapping or behind the body, the probes deal with that
+            gap = max(gap, 0)
+            if gap < travel or (hit is None and gap == travel):
+                hit, travel = o, gap
+
+        direction = 1 if distance > 0 else -1
+        self.pos[axis] += travel * direction
+        if hit is None:
+            return
+
+        wake_body(hit)
+        for vel in velocities:
+            vel[axis] = min(vel[axis], 0) if direction > 0 else max(vel[axis], 0)
+
+        if axis == 0:
+            normal = (-direction, 0)
+            if direction > 0:
+                self.touching_right = hit
+            else:
+                self.touching_left = hit
+        else:
+            normal = (0, -direction)
+            if direction > 0:
+                self.touching_bottom = hit
+            else:
+                self.touching_top = hit
+        self.contacts.append((normal, hit))
+
+    def update_sleep(self, vel):
+        # Call once per step after moving
+        if not self.can_sleep:
+            return
+        contacts = (self.touching_top, self.touching_bottom, self.touching_left, self.touching_right)
+        if vel.length_squared() < self.sleep_speed ** 2 and contacts == self.last_contacts:
+            self.still_steps += 1
+        else:
+            self.still_steps = 0
+        self.last_contacts = contacts
+        if self.still_steps >= self.sleep_steps:
+            self.sleep()
+
+    def sleep(self):
+        self.sleeping = True
+        self.previous_pos.update(self.pos)
+        self.ground_rect = tuple(self.touching_bottom.rect) if self.touching_bottom is not None else None
+
+    def wake(self):
+        self.sleeping = False
+        self.still_steps = 0
+
+    def check_wake(self, spatial_hash):
+        # Cheap per-step check for a sleeping body, wakes it if whatever it is resting on has moved or gone.
+        # Returns whether the body is awake.
+        if not self.sleeping:
+            return True
+        ground = self.touching_bottom
+        if ground is not None and (ground not in spatial_hash or tuple(ground.rect) != self.ground_rect):
+            self.wake()
+        return not self.sleeping
+
+
+def wake_body(obj):
+    # Wakes obj's body if it has one and is asleep, for collisions and trigger callbacks
+    body = getattr(obj, "body", None)
+    if body is not None and body.sleeping:
+        body.wake()
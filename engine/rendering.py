@@ -0,0 +1,420 @@
+from array import array
+from collections import OrderedDict
+import math
+
+import moderngl
+import numpy as np
+import pygame
+
+import engine.util
+
+LAYER_BACKGROUND = 0
+LAYER_WORLD = 10
+LAYER_EFFECTS = 20
+LAYER_OVERLAY = 30
+
+_SPRITE = object()
+_SPRITES = object()
+_TRANSFORMED = object()
+_INSTANCES = object()
+_SPRITE_KINDS = (_SPRITE, _SPRITES, _TRANSFORMED, _INSTANCES)
+
+
+class TransformCache:
+    # Scaled and rotated copies of images, keyed by (image, scale step, rotation step, flip) and made the first time
+    # they are asked for. Holds at most max_size frames, dropping the least recently used one when full.
+    def __init__(self, max_size=2048, scale_step=0.05, rotation_step=4):
+        self.max_size = max_size
+        self.scale_step = scale_step
+        self.rotation_step = rotation_step
+        self.frames = OrderedDict()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def clear(self):
+        self.frames.clear()
+
+    def get(self, image, scale_index, rotation_index, flip=False):
+        # Returns the transformed image and half its size, indices are scale / scale_step and rotation / rotation_step
+        key = (image, scale_index, rotation_index, flip)
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+            return frame
+
+        if flip:
+            image = pygame.transform.flip(image, True, False)
+        transformed = pygame.transform.rotate(pygame.transform.scale_by(image, scale_index * self.scale_step),
+                                              rotation_index * self.rotation_step)
+        frame = transformed, transformed.get_width() / 2, transformed.get_height() / 2
+        self.frames[key] = frame
+        if len(self.frames) > self.max_size:
+            self.frames.popitem(last=False)
+        return frame
+
+
+transform_cache = TransformCache()  # Shared by every software flush, sprites are the same few assets everywhere
+
+
+class RenderQueue:
+    # Draw commands collected while a state draws and run together by flush, ordered by layer, then z, then the order
+    # they were submitted in. Sprites submitted one after another are drawn with a single fblits call. Positions are
+    # screen coordinates, Manager.blit and blit_center add the camera before submitting.
+    def __init__(self):
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def clear(self):
+        self.commands = []
+
+    def submit(self, draw, args, layer=LAYER_WORLD, z=0):
+        # draw(surface, *args) is called on flush
+        self.commands.append((layer, z, draw, args))
+
+    def blit(self, surface, pos, layer=LAYER_WORLD, z=0):
+        self.commands.append((layer, z, _SPRITE, (surface, pos)))
+
+    def blits(self, blits, layer=LAYER_WORLD, z=0):
+        # A list of (surface, pos) pairs that stay together
+        if blits:
+            self.commands.append((layer, z, _SPRITES, blits))
+
+    def sprite(self, image, center, scale=1, rotation=0, flip=False, tint=None, layer=LAYER_WORLD, z=0):
+        # Centered on center, rotated counterclockwise in degrees like pygame.transform.rotate, flip mirrors it
+        # horizontally and tint multiplies its colour
+        self.commands.append((layer, z, _TRANSFORMED, (image, center, scale, rotation, flip, tint)))
+
+    def instances(self, images, image_indices, centers, scales, rotations, layer=LAYER_WORLD, z=0):
+        # Many transformed sprites at once from arrays, images[image_indices[i]] centered on centers[i]
+        if len(image_indices):
+            self.commands.append((layer, z, _INSTANCES, (images, image_indices, centers, scales, rotations)))
+
+    def rect(self, colour, rect, width=0, layer=LAYER_WORLD, z=0):
+        self.submit(pygame.draw.rect, (colour, rect, width), layer, z)
+
+    def polygon(self, colour, points, width=0, layer=LAYER_WORLD, z=0):
+        self.submit(pygame.draw.polygon, (colour, points, width), layer, z)
+
+    def polygon_alpha(self, colour, points, layer=LAYER_WORLD, z=0):
+        self.submit(engine.util.draw_polygon_alpha, (colour, points), layer, z)
+
+    def line(self, colour, start, end, width=1, layer=LAYER_WORLD, z=0):
+        self.submit(pygame.draw.line, (colour, start, end, width), layer, z)
+
+    def lines(self, colour, closed, points, width=1, layer=LAYER_WORLD, z=0):
+        self.submit(pygame.draw.lines, (colour, closed, points, width), layer, z)
+
+    def circle(self, colour, center, radius, width=0, layer=LAYER_WORLD, z=0):
+        self.submit(pygame.draw.circle, (colour, center, radius, width), layer, z)
+
+    def flush(self, surface, sprite_batch=None):
+        # With a SpriteBatchRenderer everything goes into its sprite layer, which is laid over the surface once the
+        # frame is presented. Shapes are still drawn in software, onto the batch's shape surface, and each run of
+        # them goes into the layer as one sprite between whatever was submitted before and after it.
+        commands = self.commands
+        self.commands = []
+        commands.sort(key=lambda command: (command[0], command[1]))  # Stable, so ties keep submission order
+
+        if sprite_batch is not None:
+            shapes = None  # What the current run of shapes covers
+            for layer, z, draw, args in commands:
+                if draw not in _SPRITE_KINDS:
+                    rect = draw(sprite_batch.shape_surface, *args)
+                    if not isinstance(rect, pygame.Rect):
+                        rect = sprite_batch.shape_surface.get_rect()
+                    if rect.width and rect.height:
+                        shapes = rect if shapes is None else shapes.union(rect)
+                    continue
+                if shapes is not None:
+                    sprite_batch.add_shapes(shapes)
+                    shapes = None
+
+                if draw is _SPRITE:
+                    sprite_batch.add(*args)
+                elif draw is _SPRITES:
+                    for image, pos in args:
+                        sprite_batch.add(image, pos)
+                elif draw is _TRANSFORMED:
+                    sprite_batch.add_transformed(*args)
+                else:
+                    sprite_batch.add_instances(*args)
+            if shapes is not None:
+                sprite_batch.add_shapes(shapes)
+            return
+
+        run = []
+        for layer, z, draw, args in commands:
+            if draw is _SPRITE:
+                run.append(args)
+            elif draw is _SPRITES:
+                run.extend(args)
+            elif draw is _TRANSFORMED:
+                run.append(self.transform(*args))
+            elif draw is _INSTANCES:
+                run.extend(self.transform_instances(*args))
+            else:
+                if run:
+                    surface.fblits(run)
+                    run = []
+                draw(surface, *args)
+        if run:
+            surface.fblits(run)
+
+    @staticmethod
+    def transform(image, center, scale, rotation, flip, tint):
+        cache = transform_cache
+        scale_index = max(round(scale / cache.scale_step), 1)
+        rotation_index = round(rotation / cache.rotation_step) % round(360 / cache.rotation_step)
+        image, half_width, half_height = cache.get(image, scale_index, rotation_index, flip)
+        if tint is not None:
+            image = image.copy()
+            image.fill(tint, special_flags=pygame.BLEND_RGBA_MULT)
+        return image, (center[0] - half_width, center[1] - half_height)
+
+    @staticmethod
+    def transform_instances(images, image_indices, centers, scales, rotations):
+        cache = transform_cache
+        scale_indices = np.maximum(np.rint(np.asarray(scales) / cache.scale_step), 1).astype(int).tolist()
+        rotation_steps = round(360 / cache.rotation_step)
+        rotation_indices = (np.rint(np.asarray(rotations) / cache.rotation_step).astype(int) % rotation_steps).tolist()
+
+        blits = []
+        for image_index, scale_index, rotation_index, (x, y) in zip(np.asarray(image_indices).tolist(), scale_indices,
+                                                                     rotation_indices, np.asarray(centers).tolist()):
+            image, half_width, half_height = cache.get(images[image_index], scale_index, rotation_index)
+            blits.append((image, (x - half_width, y - half_height)))
+        return blits
+
+
+class SpriteBatchRenderer:
+    # Draws sprites on the GPU as instanced quads into a premultiplied sprite layer the size of the frame, which the
+    # frame shader lays over the software drawn frame. Each surface is uploaded once, small ones are packed into a
+    # shared atlas on shelves so a frame is usually a single draw call; when the atlas is full it is emptied and
+    # refilled with whatever is drawn next. Surfaces are keyed by identity, so they mustn't change once drawn, and
+    # ones that haven't been drawn for max_idle_frames are dropped so surfaces made fresh every frame don't pile up.
+    # Anything else is drawn onto shape_surface and handed over with add_shapes, which keeps it in order.
+    def __init__(self, ctx, size, vert_path="shaders/sprite_vertex.glsl", frag_path="shaders/sprite_fragment.glsl",
+                 atlas_size=2048, max_atlas_item=512, max_textures=32, max_idle_frames=60):
+        self.ctx = ctx
+        self.size = size
+        self.texture = ctx.texture(size, 4)
+        self.texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+        self.framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+
+        with open(vert_path, "r") as vert_file, open(frag_path, "r") as frag_file:
+            self.program = ctx.program(vertex_shader=vert_file.read(), fragment_shader=frag_file.read())
+        self.program["resolution"] = size
+        self.program["atlas"] = 0
+
+        self.atlas_size = atlas_size
+        self.max_atlas_item = max_atlas_item
+        self.atlas = ctx.texture((atlas_size, atlas_size), 4)
+        self.atlas.filter = (moderngl.NEAREST, moderngl.NEAREST)
+        self.regions = {}  # Surface -> (texture, (u0, v0, u1, v1))
+        self.shelf_x = self.shelf_y = self.shelf_height = 0
+
+        self.max_textures = max_textures
+        self.textures = OrderedDict()  # Surfaces too big for the atlas -> their own texture
+
+        self.max_idle_frames = max_idle_frames
+        self.frame = 0
+        self.last_used = {}  # Surface -> frame it was last drawn in
+
+        self.shape_surface = pygame.Surface(size, pygame.SRCALPHA, 32)
+        self.shape_texture = ctx.texture(size, 4)
+        self.shape_texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+        self.shape_texture.swizzle = 'BGRA'
+
+        self.corners = ctx.buffer(data=array('f', [0, 0, 1, 0, 0, 1, 1, 1]))
+        self.instance_buffer = None
+        self.render_object = None
+
+        self.runs = []  # [texture, chunks], chunks are lists of instance rows or arrays of them, in draw order
+        self.cleared = False
+
+    def region(self, surface):
+        self.last_used[surface] = self.frame
+        region = self.regions.get(surface)
+        if region is None:
+            return self.upload(surface)
+        if region[0] is not self.atlas:
+            self.textures.move_to_end(surface)
+        return region
+
+    def upload(self, surface):
+        width, height = surface.get_size()
+        data = pygame.image.tobytes(surface, "RGBA")
+
+        if width > self.max_atlas_item or height > self.max_atlas_item:
+            texture = self.ctx.texture((width, height), 4, data)
+            texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+            self.textures[surface] = texture
+            region = self.regions[surface] = texture, (0, 0, 1, 1)
+            return region
+
+        # 1 px gap between sprites so nothing bleeds in when they're scaled or rotated
+        if self.shelf_x + width + 1 > self.atlas_size:
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_height
+            self.shelf_height = 0
+        if self.shelf_y + height + 1 > self.atlas_size:
+            self.reset_atlas()
+        x, y = self.shelf_x, self.shelf_y
+        self.shelf_x += width + 1
+        self.shelf_height = max(self.shelf_height, height + 1)
+
+        self.atlas.write(data, viewport=(x, y, width, height))
+        size = self.atlas_size
+        region = self.regions[surface] = self.atlas, (x / size, y / size, (x + width) / size, (y + height) / size)
+        return region
+
+    def reset_atlas(self):
+        # Whatever is waiting still points at the old atlas layout, so it's drawn before the atlas is reused
+        self.draw_runs()
+        self.regions = {surface: region for surface, region in self.regions.items() if surface in self.textures}
+        self.last_used = {surface: frame for surface, frame in self.last_used.items() if surface in self.regions}
+        self.shelf_x = self.shelf_y = self.shelf_height = 0
+
+    def add_row(self, texture, row):
+        if not self.runs or self.runs[-1][0] is not texture:
+            self.runs.append([texture, []])
+        chunks = self.runs[-1][1]
+        if not chunks or not isinstance(chunks[-1], list):
+            chunks.append([])
+        chunks[-1].append(row)
+
+    def add(self, surface, pos):
+        texture, uv = self.region(surface)
+        width, height = surface.get_size()
+        self.add_row(texture, (pos[0] + width / 2, pos[1] + height / 2, width, height, 0, *uv, 1, 1, 1, 1))
+
+    def add_transformed(self, surface, center, scale=1, rotation=0, flip=False, tint=None):
+        texture, (u0, v0, u1, v1) = self.region(surface)
+        if flip:
+            u0, u1 = u1, u0
+        width, height = surface.get_size()
+        r, g, b, a = (1, 1, 1, 1) if tint is None else pygame.Color(tint).normalize()
+        self.add_row(texture, (center[0], center[1], width * scale, height * scale, math.radians(rotation),
+                               u0, v0, u1, v1, r, g, b, a))
+
+    def add_instances(self, images, image_indices, centers, scales, rotations):
+        regions = [self.region(image) for image in images]
+        if any(image not in self.regions for image in images):
+            regions = [self.region(image) for image in images]  # The atlas filled up and was emptied part way
+        texture = regions[0][0]
+        if any(region[0] is not texture for region in regions) or texture is not self.atlas:
+            for image_index, center, scale, rotation in zip(np.asarray(image_indices).tolist(),
+                                                            np.asarray(centers).tolist(),
+                                                            np.asarray(scales).tolist(),
+                                                            np.asarray(rotations).tolist()):
+                self.add_transformed(images[image_index], center, scale, rotation)
+            return
+
+        uvs = np.array([region[1] for region in regions], dtype="f4")
+        sizes = np.array([image.get_size() for image in images], dtype="f4")
+        image_indices = np.asarray(image_indices)
+        rows = np.empty((len(image_indices), 13), dtype="f4")
+        rows[:, 0:2] = centers
+        rows[:, 2:4] = sizes[image_indices] * np.asarray(scales, dtype="f4")[:, None]
+        rows[:, 4] = np.radians(rotations)
+        rows[:, 5:9] = uvs[image_indices]
+        rows[:, 9:13] = 1
+
+        if not self.runs or self.runs[-1][0] is not self.atlas:
+            self.runs.append([self.atlas, []])
+        self.runs[-1][1].append(rows)
+
+    def add_shapes(self, rect):
+        # Lays rect of shape_surface into the sprite layer and clears it. shape_texture is reused for every run of
+        # shapes, so what came before is drawn first and the shapes straight away. The rows rect covers are uploaded
+        # whole, straight out of the surface's pixels.
+        rect = rect.clip(self.shape_surface.get_rect())
+        if rect.width and rect.height:
+            self.draw_runs()
+            width, height = self.size
+            pitch = self.shape_surface.get_pitch()
+            with memoryview(self.shape_surface.get_buffer()) as pixels:
+                self.shape_texture.write(pixels[rect.y * pitch:rect.bottom * pitch],
+                                         viewport=(0, rect.y, width, rect.height))
+            self.add_row(self.shape_texture, (rect.x + rect.width / 2, rect.y + rect.height / 2, rect.width,
+                                              rect.height, 0, rect.x / width, rect.y / height, rect.right / width,
+                                              rect.bottom / height, 1, 1, 1, 1))
+            self.draw_runs()
+        self.shape_surface.fill((0, 0, 0, 0), rect)
+
+    def draw_runs(self):
+        previous_framebuffer = self.ctx.fbo
+        self.framebuffer.use()
+        if not self.cleared:
+            self.framebuffer.clear(0, 0, 0, 0)
+            self.cleared = True
+
+        if self.runs:
+            self.ctx.enable(moderngl.BLEND)
+            self.ctx.blend_func = moderngl.ONE, moderngl.ONE_MINUS_SRC_ALPHA
+            for texture, chunks in self.runs:
+                rows = np.concatenate([np.asarray(chunk, dtype="f4") for chunk in chunks])
+                # The buffer only grows, so most frames just overwrite it
+                if self.instance_buffer is None or self.instance_buffer.size < rows.nbytes:
+                    if self.instance_buffer is not None:
+                        self.render_object.release()
+                        self.instance_buffer.release()
+                    self.instance_buffer = self.ctx.buffer(reserve=rows.nbytes * 2, dynamic=True)
+                    self.render_object = self.ctx.vertex_array(self.program, [
+                        (self.corners, "2f", "corner"),
+                        (self.instance_buffer, "2f 2f 1f 4f 4f/i", "center", "size", "rotation", "uv_rect", "tint")
+                    ])
+                self.instance_buffer.write(rows)
+                texture.use(0)
+                self.render_object.render(moderngl.TRIANGLE_STRIP, vertices=4, instances=len(rows))
+            self.ctx.disable(moderngl.BLEND)
+            self.runs = []
+
+        if previous_framebuffer is not None:
+            previous_framebuffer.use()
+
+    def render(self):
+        # Finishes the frame's sprite layer, after this the next sprite added starts a new frame
+        self.draw_runs()
+
+        stale = [surface for surface, frame in self.last_used.items() if self.frame - frame >= self.max_idle_frames]
+        for surface in stale:
+            del self.last_used[surface]
+            texture, uv = self.regions.pop(surface)
+            if texture is not self.atlas:
+                del self.textures[surface]
+                texture.release()
+        # The shelves can't reuse the gaps, so once they're past half the atlas it's emptied and what's still drawn
+        # gets packed again next frame
+        if stale and self.shelf_y > self.atlas_size / 2:
+            self.reset_atlas()
+
+        while len(self.textures) > self.max_textures:
+            surface, texture = self.textures.popitem(last=False)
+            self.regions.pop(surface, None)
+            self.last_used.pop(surface, None)
+            texture.release()
+
+        self.frame += 1
+        self.cleared = False
+
+    def read(self):
+        # Sprite layer as an (height, width, 4) array with row 0 at the top of the frame, mostly for testing
+        data = np.frombuffer(self.framebuffer.read(components=4), dtype=np.uint8)
+        return data.reshape(self.size[1], self.size[0], 4)
+
+    def release(self):
+        if self.instance_buffer is not None:
+            self.render_object.release()
+            self.instance_buffer.release()
+        for texture in self.textures.values():
+            texture.release()
+        self.corners.release()
+        self.shape_texture.release()
+        self.atlas.release()
+        self.framebuffer.release()
+        self.texture.release()
+        self.program.release()
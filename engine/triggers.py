@@ -0,0 +1,89 @@
+import pygame
+
+from engine.physics import SpatialHash
+
+LAYER_PLAYER = 1 << 0
+LAYER_BODY = 1 << 1
+LAYER_ALL = 0xFFFF
+
+
+class Trigger:
+    # A rect (or circle when radius is set) volume owned by an entity. The rect can be shared with the owner and updated
+    # in place, call TriggerSystem.move after moving it so the broadphase knows.
+    def __init__(self, owner, rect, layer_mask=LAYER_ALL, radius=None, center=None):
+        self.owner = owner
+        self.rect = rect
+        self.layer_mask = layer_mask
+        self.radius = radius
+        self.center = pygame.Vector2(center if center is not None else rect.center)
+        self.enabled = True
+
+    @classmethod
+    def circle(cls, owner, center, radius, layer_mask=LAYER_ALL):
+        rect = pygame.Rect(0, 0, radius * 2, radius * 2)
+        rect.center = center
+        return cls(owner, rect, layer_mask, radius, center)
+
+    def overlaps(self, rect):
+        if self.radius is None:
+            return self.rect.colliderect(rect)
+        # Distance from the circle's center to the closest point of the rect
+        dx = self.center.x - max(rect.left, min(self.center.x, rect.right))
+        dy = self.center.y - max(rect.top, min(self.center.y, rect.bottom))
+        return dx * dx + dy * dy < self.radius * self.radius
+
+
+class TriggerSystem:
+    # Tests every registered actor against the triggers near it once per step and calls on_trigger_enter,
+    # on_trigger_stay and on_trigger_exit(actor, scene) on the trigger's owner. Triggers nothing is near cost nothing.
+    def __init__(self, cell_size=128):
+        self.triggers = SpatialHash(cell_size)
+        self.actors = {}  # actor -> layer
+        self.overlaps = {}  # trigger -> actors inside it as of the last update
+
+    def add(self, trigger):
+        self.triggers.insert(trigger)
+
+    def remove(self, trigger):
+        self.triggers.remove(trigger)
+        self.overlaps.pop(trigger, None)
+
+    def move(self, trigger):
+        self.triggers.update(trigger)
+
+    def add_actor(self, actor, layer=LAYER_PLAYER):
+        self.actors[actor] = layer
+
+    def remove_actor(self, actor):
+        self.actors.pop(actor, None)
+        for actors in self.overlaps.values():
+            actors.pop(actor, None)
+
+    def update(self, scene):
+        current = {}
+        for actor, layer in self.actors.items():
+            rect = actor.rect
+            for trigger in self.triggers.query(rect):
+                if trigger.enabled and trigger.layer_mask & layer and trigger.overlaps(rect):
+                    current.setdefault(trigger, {})[actor] = None
+
+        previous = self.overlaps
+        self.overlaps = current
+
+        # Callbacks may add or remove actors and triggers (saving a level removes the player), so go over copies and
+        # skip actors that were removed by an earlier callback
+        for trigger, actors in list(current.items()):
+            was_inside = previous.get(trigger, {})
+            for actor in list(actors):
+                if actor not in self.actors:
+                    continue
+                if actor in was_inside:
+                    trigger.owner.on_trigger_stay(actor, scene)
+                else:
+                    trigger.owner.on_trigger_enter(actor, scene)
+
+        for trigger, actors in list(previous.items()):
+            now_inside = current.get(trigger, {})
+            for actor in list(actors):
+                if actor not in now_inside and actor in self.actors:
+                    trigger.owner.on_trigger_exit(actor, scene)
@@ -1,8 +1,14 @@
+import glob
 import json
+import os
+import sys
 
 from pygame import Vector2
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from level_layout import merge_tiles
+
 
 class Rect:
     def __init__(self, pos, size):
@@ -14,7 +20,19 @@ class Tile(Rect):
     ...
 
 
-class Air(Rect):
+class PassableTile(Rect):
+    ...
+
+
+class VinyTile(Rect):
+    ...
+
+
+class GrassyTile(Rect):
+    ...
+
+
+class FoliageTile(Rect):
     ...
 
 
@@ -37,7 +55,11 @@ class Batch:
 
 IDs = {
     "#": Tile,
-    " ": Air
+    "P": PassableTile,
+    "V": VinyTile,
+    "G": GrassyTile,
+    "F": FoliageTile,
+    " ": None
 }
 
 tile_size = Vector2(32, 32)
@@ -46,7 +68,7 @@ with open("../gamedata/levels/0_0.json") as file:
     example_level = json.loads(file.read())["layout"]
 
 
-def unpack_level(level):
+def unpack_level_rows(level):
     batches = []  # set()
 
     for y, row in enumerate(level):
@@ -63,8 +85,17 @@ def unpack_level(level):
                 continue
             batches.append(batch)
 
+    return batches
+
+
+def unpack_level_greedy(level):
+    tile_types = [[IDs[tile] for tile in row] for row in level]
+    return [Batch(tile_type, (x, y), (width, height)) for tile_type, x, y, width, height in merge_tiles(tile_types)]
+
+
+def unpack_level(level):
     objects = {}
-    for i, batch in enumerate(batches):
+    for i, batch in enumerate(unpack_level_greedy(level)):
         objects[f"batch_{i}"] = batch.convert()
 
     return objects
@@ -75,3 +106,10 @@ if __name__ == "__main__":
     unpack_level(example_level)
     end = time.time()
     print(f"done in {(end - start) * 1000}ms")
+
+    for path in sorted(glob.glob("../gamedata/levels/*.json")):
+        with open(path) as file:
+            layout = json.loads(file.read())["layout"]
+        row_batches = len(unpack_level_rows(layout))
+        greedy_batches = len(unpack_level_greedy(layout))
+        print(f"{path}: {row_batches} row batches -> {greedy_batches} merged batches")
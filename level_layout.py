@@ -0,0 +1,30 @@
+def merge_tiles(tile_types):
+    # Greedy rectangle merging over rows of tile types (None is empty). Runs of the same type are grown along the row
+    # and then down as far as every tile underneath matches, so solid blocks become a single rect instead of one per
+    # row. Returns [(type, x, y, width, height)] in tiles.
+    merged = [[False] * len(row) for row in tile_types]
+    rects = []
+
+    for y, row in enumerate(tile_types):
+        for x, tile_type in enumerate(row):
+            if tile_type is None or merged[y][x]:
+                continue
+
+            width = 1
+            while x + width < len(row) and row[x + width] is tile_type and not merged[y][x + width]:
+                width += 1
+
+            height = 1
+            while y + height < len(tile_types):
+                below = tile_types[y + height]
+                if len(below) < x + width:
+                    break
+                if not all(below[i] is tile_type and not merged[y + height][i] for i in range(x, x + width)):
+                    break
+                height += 1
+
+            for merged_row in merged[y:y + height]:
+                merged_row[x:x + width] = [True] * width
+            rects.append((tile_type, x, y, width, height))
+
+    return rects
@@ -9,14 +9,19 @@ import random
 import sys
 import pygame.gfxdraw
 
+import numpy as np
 import pygame
 import pygame_gui as gui
 from pygame import Vector2
 
 import engine
 import engine.math
+import engine.lighting
+import engine.physics
+import engine.triggers
 from engine import settings
 from engine.util import play_randomly_pitched_sound
+from level_layout import merge_tiles
 
 try:
     import pyi_splash
@@ -289,11 +294,16 @@ class SettingsMenu(engine.State):
 
 
 class Level(engine.State):
+    gpu_sprites = True
+
     def __init__(self, manager):
         self.spawn_positions = {}
         self.position = None
+        self.tile_grid = None
         super().__init__(manager)
-        self.add_object("background", engine.Sprite("background1", (0, 0)))
+        background = engine.Sprite("background1", (0, 0))
+        background.static = True
+        self.add_object("background", background)
         self.add_object("particle manager", engine.ParticleManager())
 
     def addPlayer(self, selection, pos=(30, 15)):
@@ -301,6 +311,8 @@ class Level(engine.State):
             case 0:  # Skirmbolg
                 player = Player(pos)
                 player.pos[1] -= player.size[1]
+                player.updateBoundingPoints()
+                player.body.snap_interpolation()
                 self.add_phys_object("player", player)
             case 1:  # Toe
                 player = Player(pos, (33, 49))
@@ -311,6 +323,8 @@ class Level(engine.State):
                 player.walk_anim_right = engine.Animation("assets/toe/walk")
                 player.jump_anim = engine.Animation("assets/toe/jump")
                 player.fall_anim = engine.Animation("assets/toe/fall")
+                player.updateBoundingPoints()
+                player.body.snap_interpolation()
                 self.add_phys_object("player", player)
 
     def on_update(self):
@@ -326,10 +340,12 @@ class Level(engine.State):
                 pause_menu = PauseMenu(engine.manager)
                 engine.manager.set_state(pause_menu, clear_threads=True)
             elif event.key == pygame.K_F5:
+                engine.lighting.clear_baked_lights(self.position)
                 level = load_json_level(f"gamedata/levels/{self.position}.json")
                 engine.manager.set_state(level)
             elif event.key == pygame.K_F7:
                 engine.manager.reloadAssets()
+                engine.lighting.clear_baked_lights(self.position)
                 level = load_json_level(f"gamedata/levels/{self.position}.json")
                 engine.manager.set_state(level)
 
@@ -345,18 +361,18 @@ class PhysicsObject(engine.TickableEntity):
 
         self.hitbox_depth = 4
 
-        self.rect = None
-        self.check_box_bottom = None
-        self.check_box_right = None
-        self.check_box_left = None
-        self.check_box_top = None
+        self.body = engine.physics.KinematicBody(self, self.pos, self.size, hitbox_depth=self.hitbox_depth)
+        self.body.can_sleep = True
+        self.rect = self.body.rect
+        self.check_box_bottom = self.body.check_box_bottom
+        self.check_box_right = self.body.check_box_right
+        self.check_box_left = self.body.check_box_left
+        self.check_box_top = self.body.check_box_top
 
-        self.updateBoundingPoints()
-
-        self.touching_top = False
-        self.touching_bottom = False
-        self.touching_right = False
-        self.touching_left = False
+        self.touching_top = None
+        self.touching_bottom = None
+        self.touching_right = None
+        self.touching_left = None
 
         self.gravity = 1500
         self.drag = 10
@@ -365,66 +381,41 @@ class PhysicsObject(engine.TickableEntity):
         self.animation.serialize()
 
     def updateBoundingPoints(self):
-        self.rect = pygame.Rect(self.pos, (self.size.x, self.size.y))
-        self.check_box_bottom = pygame.Rect(self.pos + (0, self.size.y), (self.size.x, self.hitbox_depth))
-        self.check_box_right = pygame.Rect(self.pos + (self.size.x, 0), (self.hitbox_depth, self.size.y))
-        self.check_box_left = pygame.Rect(self.pos + (-self.hitbox_depth, 0), (self.hitbox_depth, self.size.y))
-        self.check_box_top = pygame.Rect(self.pos + (0, -self.hitbox_depth), (self.size.x, self.hitbox_depth))
+        self.body.update_bounds()
 
     def update(self, *args):
         # Physics and collisions
         scene: engine.State = args[0]
+        body = self.body
 
-        self.touching_top = False
-        self.touching_bottom = False
-        self.touching_right = False
-        self.touching_left = False
+        if body.sleeping and not body.check_wake(scene.spatial_hash):
+            return
 
         self.vel.x = engine.math.lerp(self.vel.x, 0, self.drag * engine.delta())
 
         temp_vel = self.vel + (0, self.gravity * engine.delta())
 
-        # Check bottom for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_bottom, scene.physics_objects)
-        if col:
-            temp_vel.y = min(temp_vel.y, 0)
-            self.pos.y -= self.check_box_bottom.y - col.rect.y
-            self.touching_bottom = col
-
-        # Check top for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_top, scene.physics_objects)
-        if col:
-            temp_vel.y = max(temp_vel.y, 0)
-            self.touching_top = col
-
-        # Check left for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_left, scene.physics_objects)
-        if col:
-            temp_vel.x = max(temp_vel.x, 0)
-            self.touching_left = col
-
-        # Check right for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_right, scene.physics_objects)
-        if col:
-            temp_vel.x = min(temp_vel.x, 0)
-            self.touching_right = col
+        body.probe(scene.spatial_hash)
+        body.clip_velocity(temp_vel)
 
         self.vel = temp_vel
-        self.pos = self.pos + self.vel * engine.delta()
-        self.updateBoundingPoints()
+        body.move(self.vel * engine.delta(), scene.spatial_hash, self.vel)
+        body.update_sleep(self.vel)
+
+        self.touching_top = body.touching_top
+        self.touching_bottom = body.touching_bottom
+        self.touching_right = body.touching_right
+        self.touching_left = body.touching_left
 
     def on_draw(self, *args):
         if self.animation is None:
-            pygame.draw.rect(engine.get_surface(), (255, 0, 68), self.rect)
+            engine.manager.render_queue.rect((255, 0, 68), self.rect)
         else:
-            engine.manager.blit(self.animation.update_animation(), self.pos + self.animation_pos)
+            engine.manager.blit(self.animation.update_animation(),
+                                self.body.interpolated_pos(engine.alpha()) + self.animation_pos)
 
     def on_draw_debug(self, *args):
-        pygame.draw.rect(engine.get_surface(), (255, 0, 0), self.rect, 1)
+        pygame.draw.rect(engine.get_surface(), (255, 0, 0) if not self.body.sleeping else (100, 100, 100), self.rect, 1)
         pygame.draw.rect(engine.get_surface(),
                          (255, 255, 204) if not self.touching_bottom else (0, 255, 0),
                          self.check_box_bottom, 1)
@@ -444,6 +435,8 @@ class PushablePhysicsObject(PhysicsObject):
 
     def update(self, *args):
         super().update(*args)
+        if self.body.sleeping:
+            return
         if type(self.touching_left) in self.push_classes:
             self.vel.x += self.push_speed * engine.delta()
         if type(self.touching_right) in self.push_classes:
@@ -474,11 +467,12 @@ class Player(engine.TickableEntity):
 
         self.hitbox_depth = 4
 
-        self.rect = pygame.Rect(self.pos, self.size)
-        self.check_box_bottom = pygame.Rect(self.pos + (0, self.size.y), (self.size.x, self.hitbox_depth))
-        self.check_box_right = pygame.Rect(self.pos + (self.size.x, 0), (self.hitbox_depth, self.size.y))
-        self.check_box_left = pygame.Rect(self.pos - (self.hitbox_depth, 0), (self.hitbox_depth, self.size.y))
-        self.check_box_top = pygame.Rect(self.pos - (0, self.hitbox_depth), (self.size.x, self.hitbox_depth))
+        self.body = engine.physics.KinematicBody(self, self.pos, self.size, hitbox_depth=self.hitbox_depth)
+        self.rect = self.body.rect
+        self.check_box_bottom = self.body.check_box_bottom
+        self.check_box_right = self.body.check_box_right
+        self.check_box_left = self.body.check_box_left
+        self.check_box_top = self.body.check_box_top
 
         self.touching_top = False
         self.touching_bottom = False
@@ -486,6 +480,7 @@ class Player(engine.TickableEntity):
         self.touching_left = False
 
         self.ground_particle_position = self.pos + (self.size.x / 2, self.size.y)
+        self.ground_emitter = engine.Emitter(EMITTERS["ground_trail"])
 
         self.walk_anim_left = engine.Animation("assets/skirmbolg/walk", 0.075)
         self.walk_anim_right = engine.Animation("assets/skirmbolg/walk", 0.075).flip()
@@ -505,24 +500,16 @@ class Player(engine.TickableEntity):
 
         self.allow_movement = True
 
-    def updateBoundingPoints(self):
-        self.rect = pygame.Rect(self.pos, self.size)
-        self.check_box_bottom = pygame.Rect(self.pos + (0, self.size.y), (self.size.x, self.hitbox_depth))
-        self.check_box_right = pygame.Rect(self.pos + (self.size.x, 0), (self.hitbox_depth, self.size.y))
-        self.check_box_left = pygame.Rect(self.pos - (self.hitbox_depth, 0), (self.hitbox_depth, self.size.y))
-        self.check_box_top = pygame.Rect(self.pos - (0, self.hitbox_depth), (self.size.x, self.hitbox_depth))
+        self.trigger_layer = engine.triggers.LAYER_PLAYER
 
+    def updateBoundingPoints(self):
+        self.body.update_bounds()
         self.ground_particle_position = self.pos + (self.size.x / 2, self.size.y)
 
     def update(self, *args):
         # Physics and collisions
         scene: engine.State = args[0]
 
-        self.touching_top = False
-        self.touching_bottom = False
-        self.touching_right = False
-        self.touching_left = False
-
         # Apply drag
         self.vel.x = engine.math.lerp(self.vel.x, 0, self.drag * engine.delta())
 
@@ -531,48 +518,27 @@ class Player(engine.TickableEntity):
                    pygame.key.get_pressed()[pygame.K_DOWN] else self.gravity)
         temp_vel = self.vel + gravity * engine.delta()
 
-        # Check bottom for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_bottom, scene.physics_objects)
-        if col:
-            temp_vel.y = min(temp_vel.y, 0)
-            if self.vel.y > 0:
-                self.pos.y -= self.check_box_bottom.y - col.rect.y
-            self.touching_bottom = True
-
-        # Check top for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_top, scene.physics_objects)
-        if col:
-            temp_vel.y = max(temp_vel.y, 0)
-            self.touching_top = True
-
-        # Check left for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_left, scene.physics_objects)
-        if col:
-            temp_vel.x = max(temp_vel.x, 0)
-            self.controlled_vel.x = max(self.controlled_vel.x, 0)
-            self.touching_left = True
-
-        # Check right for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_right, scene.physics_objects)
-        if col:
-            temp_vel.x = min(temp_vel.x, 0)
-            self.controlled_vel.x = min(self.controlled_vel.x, 0)
-            self.touching_right = True
+        body = self.body
+        body.probe(scene.spatial_hash, snap=self.vel.y > 0)
+        body.clip_velocity(temp_vel)
+        body.clip_velocity(self.controlled_vel)
 
         self.vel = temp_vel
-        self.pos = self.pos + (self.vel + self.controlled_vel) * engine.delta()
+        body.move((self.vel + self.controlled_vel) * engine.delta(), scene.spatial_hash, self.vel, self.controlled_vel)
         self.updateBoundingPoints()
 
+        self.touching_top = body.touching_top is not None
+        self.touching_bottom = body.touching_bottom is not None
+        self.touching_right = body.touching_right is not None
+        self.touching_left = body.touching_left is not None
+
         # Player input & movement
         self.coyote_time_timer -= engine.delta()
         if self.touching_bottom:
             self.coyote_time_timer = self.coyote_time
 
         keys = pygame.key.get_pressed()
+        particles = scene.objects["particle manager"]
 
         if keys[self.left_key] or keys[self.right_key]:
             self.horizontal += self.acceleration * engine.delta()
@@ -585,14 +551,12 @@ class Player(engine.TickableEntity):
                 self.coyote_time_timer = 0
                 self.vel[1] = self.jump_power
                 play_randomly_pitched_sound(engine.get_asset("jump"))
-                for p in range(20):
-                    addParticle(self.ground_particle_position, scene)
+                particles.emit(EMITTERS["jump"], self.ground_particle_position)
 
             if keys[self.left_key]:
                 if self.direction != -1:
                     if self.touching_bottom and abs(self.vel[0]) < 1:
-                        for p in range(20):
-                            addParticle(self.ground_particle_position, scene, "dust_particle")
+                        particles.emit(EMITTERS["turn_dust"], self.ground_particle_position)
                     self.vel[0] += self.controlled_vel[0]
                     self.controlled_vel[0] = 0
                 self.direction = -1
@@ -600,8 +564,7 @@ class Player(engine.TickableEntity):
 
                 if self.direction != 1:
                     if self.touching_bottom and abs(self.vel[0]) < 1:
-                        for p in range(20):
-                            addParticle(self.ground_particle_position, scene, "dust_particle")
+                        particles.emit(EMITTERS["turn_dust"], self.ground_particle_position)
                     self.vel[0] += self.controlled_vel[0]
                     self.controlled_vel[0] = 0
                 self.direction = 1
@@ -613,18 +576,19 @@ class Player(engine.TickableEntity):
         self.controlled_vel[0] = self.speed_func(self.horizontal) * self.direction
 
         # Animations and other fx
+        if self.touching_bottom and (keys[self.left_key] or keys[self.right_key]) and not self.vel[1]:
+            self.ground_emitter.update(particles, self.ground_particle_position, engine.delta())
+        else:
+            self.ground_emitter.reset()
+
         if self.vel[1] < 0:
             self.animation = self.jump_anim
         elif self.vel[1] > 0:
             self.animation = self.fall_anim
         elif keys[self.left_key]:
             self.animation = self.walk_anim_left
-            if self.touching_bottom:
-                addParticle(self.ground_particle_position, scene)
         elif keys[self.right_key]:
             self.animation = self.walk_anim_right
-            if self.touching_bottom:
-                addParticle(self.ground_particle_position, scene)
         else:
             if self.direction == 1:
                 self.animation = self.idle_anim_right
@@ -633,10 +597,12 @@ class Player(engine.TickableEntity):
 
         if pygame.mouse.get_pressed()[0] and engine.debug:
             self.vel = Vector2()
-            self.pos = Vector2(pygame.mouse.get_pos())
+            self.pos.update(pygame.mouse.get_pos())
+            self.updateBoundingPoints()
+            self.body.snap_interpolation()
 
     def on_draw(self, *args):
-        engine.manager.blit(self.animation.update_animation(), self.pos)
+        engine.manager.blit(self.animation.update_animation(), self.body.interpolated_pos(engine.alpha()))
 
     def on_draw_debug(self, *args):
         pygame.draw.rect(engine.get_surface(), (255, 0, 0), self.rect, 1)
@@ -653,6 +619,8 @@ class Player(engine.TickableEntity):
 
 
 class Platform(engine.TickableEntity):
+    static = True
+
     def __init__(self, pos, size, image=None, draw=True):
         self.pos = Vector2(pos)
         self.size = Vector2(size)
@@ -666,7 +634,7 @@ class Platform(engine.TickableEntity):
 
     def on_draw(self, *args):
         if self.draw:
-            pygame.draw.rect(engine.get_surface(), (24, 20, 37), self.draw_rect)
+            engine.manager.render_queue.rect((24, 20, 37), self.draw_rect.move(engine.manager.camera))
         elif self.image is not None:
             engine.manager.blit(engine.get_asset(self.image), self.pos)
 
@@ -681,12 +649,13 @@ class GrassyPlatform(Platform):
 
     def update(self, *args):
         if not self.is_grass_added:
-            grass = GrassPatch(
-                self.pos + (3, 0),
-                self.size.x
-            )
             scene = args[0]
-            scene.add_buffered_object(f"{self}_grass", grass)
+            for i, (x, width) in enumerate(exposed_spans(scene, self.rect, "top")):
+                grass = GrassPatch(
+                    Vector2(x, self.pos.y) + (3, 0),
+                    width
+                )
+                scene.add_buffered_object(f"{self}_grass_{i}", grass)
             self.is_grass_added = True
 
         super().update(*args)
@@ -699,14 +668,15 @@ class VinyPlatform(Platform):
 
     def update(self, *args):
         if not self.are_vines_added:
-            vine = VinePatch(
-                self.pos + (0, self.size.y),
-                self.size,
-                (50, 120),
-                True
-            )
             scene = args[0]
-            scene.add_buffered_object(f"{self}_vine", vine)
+            for i, (x, width) in enumerate(exposed_spans(scene, self.rect, "bottom")):
+                vine = VinePatch(
+                    Vector2(x, self.pos.y + self.size.y),
+                    Vector2(width, self.size.y),
+                    (50, 120),
+                    True
+                )
+                scene.add_buffered_object(f"{self}_vine_{i}", vine)
             self.are_vines_added = True
 
         super().update(*args)
@@ -719,14 +689,15 @@ class FoliagePlatform(GrassyPlatform):
 
     def update(self, *args):
         if not self.are_vines_added:
-            vine = VinePatch(
-                self.pos + (5, self.size.y),
-                self.size,
-                (50, 120),
-                True
-            )
             scene = args[0]
-            scene.add_buffered_object(f"{self}_vine", vine)
+            for i, (x, width) in enumerate(exposed_spans(scene, self.rect, "bottom")):
+                vine = VinePatch(
+                    Vector2(x, self.pos.y + self.size.y) + (5, 0),
+                    Vector2(width, self.size.y),
+                    (50, 120),
+                    True
+                )
+                scene.add_buffered_object(f"{self}_vine_{i}", vine)
             self.are_vines_added = True
 
         super().update(*args)
@@ -749,22 +720,21 @@ class PassablePlatform(Platform):
 
 
 class LevelTrigger(engine.TickableEntity):
+    static = True
+
     def __init__(self, pos, level_name, spawn_side):
         self.level_name = level_name
         self.spawn_side = spawn_side
         self.rect = pygame.Rect(pos, (10, TILE_SIZE.y * 5))
         self.rect.midbottom = tile_to_world(pos)
+        self.trigger = engine.Trigger(self, self.rect, engine.triggers.LAYER_PLAYER)
 
-    def update(self, *args):
-        scene: Level = args[0]
-        if not scene.objects["player"]:
-            return
-        player_rect = scene.objects["player"].rect
-        if self.rect.colliderect(player_rect):
-            save_level(scene)
-            level = load_json_level(f"gamedata/levels/{self.level_name}.json", self.spawn_side)
-            engine.manager.set_state(level)
-            scene.cleanup()
+    def on_trigger_enter(self, *args):
+        scene: Level = args[1]
+        save_level(scene)
+        level = load_json_level(f"gamedata/levels/{self.level_name}.json", self.spawn_side)
+        engine.manager.set_state(level)
+        scene.cleanup()
 
     def on_draw(self, *args):
         image = engine.get_asset("exit")
@@ -778,8 +748,10 @@ class BouncePad(engine.TickableEntity):
     def __init__(self, pos):
         self.pos = tile_to_world(pos)
         self.trigger_rect = pygame.Rect(self.pos, (50, 50))
+        self.trigger = engine.Trigger(self, self.trigger_rect, engine.triggers.LAYER_PLAYER)
 
         self.particle_position = self.pos + (25, 15)
+        self.particle_emitter = "mushroom"
 
         self.bounce_force = -1200
 
@@ -793,39 +765,33 @@ class BouncePad(engine.TickableEntity):
         self.idle_anim.serialize()
         self.bounce_anim.serialize()
 
-    def addParticle(self, scene, particle_img="mushroom_particle"):
-        particle = scene.objects["particle manager"].addDefinedParticle(engine.Particle(
-            engine.get_asset(particle_img),
-            self.particle_position,
-            [random.randint(-100, 100), random.randint(-100, 100)]
-        ))
-        particle.rotation_per_second = random.randint(-90, 90)
-        particle.scale_per_second = random.randint(-9, -2)
-
-    def update(self, *args):
-        scene = args[0]
-        player = scene.objects["player"]
-
-        if not player:
-            return
+    def get_bounds(self):
+        return self.trigger_rect
 
-        if self.animation not in [self.idle_anim, self.bounce_anim]:
-            self.animation = self.idle_anim
+    def on_trigger_enter(self, *args):
+        self.on_trigger_stay(*args)
 
-        if player.vel.y > 0 and self.trigger_rect.colliderect(player.rect):
+    def on_trigger_stay(self, *args):
+        player, scene = args
+        if player.vel.y > 0:
             player.vel.y = self.bounce_force
-            for p in range(20):
-                self.addParticle(scene)
+            scene.objects["particle manager"].emit(EMITTERS[self.particle_emitter], self.particle_position)
             self.bounce_anim.reset()
             self.animation = self.bounce_anim
             self.anim_timer.reset()
             play_randomly_pitched_sound(engine.get_asset("boing"))
 
+    def update(self, *args):
+        if self.animation not in [self.idle_anim, self.bounce_anim]:
+            self.animation = self.idle_anim
+
         if self.anim_timer.update():
             self.idle_anim.reset()
             self.animation = self.idle_anim
 
     def on_draw(self, *args):
+        if self.animation not in [self.idle_anim, self.bounce_anim]:
+            self.animation = self.idle_anim
         anim = self.animation.update_animation()
         engine.manager.blit(anim, self.pos)
 
@@ -841,15 +807,7 @@ class StrongBouncePad(BouncePad):
         self.bounce_force = -1600
         self.idle_anim = engine.Animation("assets/strong_bounce_pad/idle")
         self.bounce_anim = engine.Animation("assets/strong_bounce_pad/bounce", 0.05)
-
-    def addParticle(self, scene, particle_img="yellow_mushroom_particle"):
-        particle = scene.objects["particle manager"].addDefinedParticle(engine.Particle(
-            engine.get_asset(particle_img),
-            self.particle_position,
-            [random.randint(-100, 100), random.randint(-100, 100)]
-        ))
-        particle.rotation_per_second = random.randint(-90, 90)
-        particle.scale_per_second = random.randint(-9, -2)
+        self.particle_emitter = "yellow_mushroom"
 
 
 class PushableBouncePad(BouncePad):
@@ -863,94 +821,59 @@ class PushableBouncePad(BouncePad):
 
         self.hitbox_depth = 4
 
-        self.rect = None
-        self.check_box_bottom = None
-        self.check_box_right = None
-        self.check_box_left = None
-        self.check_box_top = None
+        self.body = engine.physics.KinematicBody(self, self.pos, self.size, self.hitbox_offset, self.hitbox_depth)
+        self.body.can_sleep = True
+        self.rect = self.body.rect
+        self.check_box_bottom = self.body.check_box_bottom
+        self.check_box_right = self.body.check_box_right
+        self.check_box_left = self.body.check_box_left
+        self.check_box_top = self.body.check_box_top
 
-        self.updateBoundingPoints()
-
-        self.touching_top = False
-        self.touching_bottom = False
-        self.touching_right = False
-        self.touching_left = False
+        self.touching_top = None
+        self.touching_bottom = None
+        self.touching_right = None
+        self.touching_left = None
 
         self.gravity = 1500
         self.drag = 10
 
         self.idle_anim = engine.Animation("assets/pushable_bounce_pad/idle")
         self.bounce_anim = engine.Animation("assets/pushable_bounce_pad/bounce", 0.05)
+        self.particle_emitter = "blue_mushroom"
 
         self.push_speed = 3500
         self.push_classes = Player, PushablePhysicsObject
 
-    def addParticle(self, scene, particle_img="blue_mushroom_particle"):
-        particle = scene.objects["particle manager"].addDefinedParticle(engine.Particle(
-            engine.get_asset(particle_img),
-            self.particle_position,
-            [random.randint(-100, 100), random.randint(-100, 100)]
-        ))
-        particle.rotation_per_second = random.randint(-90, 90)
-        particle.scale_per_second = random.randint(-9, -2)
-
     def updateBoundingPoints(self):
-        self.trigger_rect = pygame.Rect(self.pos, (50, 50))
+        self.trigger_rect.topleft = self.pos
         self.particle_position = self.pos + (25, 15)
-        self.rect = pygame.Rect(self.pos + self.hitbox_offset, (self.size.x, self.size.y))
-        self.check_box_bottom = pygame.Rect(self.pos + self.hitbox_offset + (0, self.size.y),
-                                            (self.size.x, self.hitbox_depth))
-        self.check_box_right = pygame.Rect(self.pos + self.hitbox_offset + (self.size.x, 0),
-                                           (self.hitbox_depth, self.size.y))
-        self.check_box_left = pygame.Rect(self.pos + self.hitbox_offset + (-self.hitbox_depth, 0),
-                                          (self.hitbox_depth, self.size.y))
-        self.check_box_top = pygame.Rect(self.pos + self.hitbox_offset + (0, -self.hitbox_depth),
-                                         (self.size.x, self.hitbox_depth))
+        self.body.update_bounds()
 
     def update(self, *args):
         scene: engine.State = args[0]
+        body = self.body
 
-        self.touching_top = False
-        self.touching_bottom = False
-        self.touching_right = False
-        self.touching_left = False
+        if body.sleeping and not body.check_wake(scene.spatial_hash):
+            super().update(*args)  # Still bounces the player and animates while asleep
+            return
 
         self.vel.x = engine.math.lerp(self.vel.x, 0, self.drag * engine.delta())
 
         temp_vel = self.vel + (0, self.gravity * engine.delta())
 
-        # Check bottom for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_bottom, scene.physics_objects)
-        if col:
-            temp_vel.y = min(temp_vel.y, 0)
-            self.pos.y -= self.check_box_bottom.y - col.rect.y
-            self.touching_bottom = col
-
-        # Check top for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_top, scene.physics_objects)
-        if col:
-            temp_vel.y = max(temp_vel.y, 0)
-            self.touching_top = col
-
-        # Check left for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_left, scene.physics_objects)
-        if col:
-            temp_vel.x = max(temp_vel.x, 0)
-            self.touching_left = col
-
-        # Check right for collisions
-        self.updateBoundingPoints()
-        col = check_collision(self.check_box_right, scene.physics_objects)
-        if col:
-            temp_vel.x = min(temp_vel.x, 0)
-            self.touching_right = col
+        body.probe(scene.spatial_hash)
+        body.clip_velocity(temp_vel)
 
         self.vel = temp_vel
-        self.pos = self.pos + self.vel * engine.delta()
+        body.move(self.vel * engine.delta(), scene.spatial_hash, self.vel)
+        body.update_sleep(self.vel)
         self.updateBoundingPoints()
+        scene.triggers.move(self.trigger)
+
+        self.touching_top = body.touching_top
+        self.touching_bottom = body.touching_bottom
+        self.touching_right = body.touching_right
+        self.touching_left = body.touching_left
 
         super().update(*args)
 
@@ -959,8 +882,14 @@ class PushableBouncePad(BouncePad):
         if type(self.touching_right) in self.push_classes:
             self.vel.x -= self.push_speed * engine.delta()
 
+    def on_draw(self, *args):
+        if self.animation not in [self.idle_anim, self.bounce_anim]:
+            self.animation = self.idle_anim
+        anim = self.animation.update_animation()
+        engine.manager.blit(anim, self.body.interpolated_pos(engine.alpha()))
+
     def on_draw_debug(self, *args):
-        pygame.draw.rect(engine.get_surface(), (255, 0, 0), self.rect, 1)
+        pygame.draw.rect(engine.get_surface(), (255, 0, 0) if not self.body.sleeping else (100, 100, 100), self.rect, 1)
         pygame.draw.rect(engine.get_surface(),
                          (255, 255, 204) if not self.touching_bottom else (0, 255, 0),
                          self.check_box_bottom, 1)
@@ -978,15 +907,7 @@ class PushableStrongBouncePad(PushableBouncePad):
         self.bounce_force = -1600
         self.idle_anim = engine.Animation("assets/pushable_strong_bounce_pad/idle")
         self.bounce_anim = engine.Animation("assets/pushable_strong_bounce_pad/bounce", 0.05)
-
-    def addParticle(self, scene, particle_img="purple_mushroom_particle"):
-        particle = scene.objects["particle manager"].addDefinedParticle(engine.Particle(
-            engine.get_asset(particle_img),
-            self.particle_position,
-            [random.randint(-100, 100), random.randint(-100, 100)]
-        ))
-        particle.rotation_per_second = random.randint(-90, 90)
-        particle.scale_per_second = random.randint(-9, -2)
+        self.particle_emitter = "purple_mushroom"
 
 
 class BouncePuff(engine.TickableEntity):
@@ -995,7 +916,7 @@ class BouncePuff(engine.TickableEntity):
         self.stalk_pos = tile_to_world(stalk_pos)
 
         self.radius = 26
-        self.hitbox = (self.pos, self.radius)  # Not really a "box" but close enough probably
+        self.trigger = engine.Trigger.circle(self, self.pos, self.radius, engine.triggers.LAYER_PLAYER)
 
         self.head_animation = None
         self.stalk_animation = None
@@ -1004,42 +925,38 @@ class BouncePuff(engine.TickableEntity):
         self.head_bounce_anim = engine.Animation("assets/bounce_puff/head/bounce", 0.05)
 
         self.stalk_idle_anim = engine.Animation("assets/bounce_puff/stalk/idle")
+        self.stalk_surfaces = {}  # Stalk animation frame -> the stalk tiled with it
 
         self.anim_timer = engine.Timer(len(self.head_bounce_anim.frames) * self.head_bounce_anim.frame_delay)
 
         # x value needs to be higher since there's no drag calculation on the player's y velocity
         self.bounce_force = Vector2(-2500, -1000)
 
+        # Head plus the stalk hanging down to stalk_pos
+        self.bounds = self.trigger.rect.union(pygame.Rect(self.pos.x - 10, self.pos.y, 20,
+                                                          abs(self.stalk_pos.y - self.pos.y)))
+
     def serialize(self):
         self.head_idle_anim.serialize()
         self.head_bounce_anim.serialize()
         self.stalk_idle_anim.serialize()
-        self.hitbox = (self.hitbox.center, self.hitbox.radius)
+        self.stalk_surfaces = {}
 
-    def update(self, *args):
-        scene = args[0]
-        player = scene.objects["player"]
-
-        if not player:
-            return
+    def get_bounds(self):
+        return self.bounds
 
-        if type(self.hitbox) is tuple:
-            self.hitbox = pygame.geometry.Circle(*self.hitbox)
+    def on_trigger_enter(self, *args):
+        self.on_trigger_stay(*args)
 
+    def on_trigger_stay(self, *args):
+        player, scene = args
         player_center = player.rect.center
 
-        if self.hitbox.colliderect(player.rect):
+        if player_center != self.pos:
             direction = (self.pos - player_center).normalize()
             bounce_vector = Vector2(direction.x * self.bounce_force.x, direction.y * self.bounce_force.y)
             player.vel = Vector2(bounce_vector)
-            for p in range(20):
-                particle = scene.objects["particle manager"].addDefinedParticle(engine.Particle(
-                    engine.get_asset("puff_particle"),
-                    self.pos, [random.randint(-200, 200), random.randint(-200, 200)]
-                ))
-                particle.rotation_per_second = random.randint(-90, 90)
-                particle.scale_per_second = random.randint(-2, -1)
-                particle.gravity = Vector2(0, random.randint(200, 500))
+            scene.objects["particle manager"].emit(EMITTERS["puff"], self.pos)
             play_randomly_pitched_sound(engine.get_asset("puff"))
             self.head_animation = self.head_bounce_anim
             self.anim_timer.reset()
@@ -1061,18 +978,22 @@ class BouncePuff(engine.TickableEntity):
 
         stalk_height = abs(self.stalk_pos.y - self.pos.y)
 
-        stalk_surf = pygame.Surface((20, stalk_height), pygame.SRCALPHA, 32)
-        num_stalks = math.ceil(stalk_height / 50)
+        # One tiled stalk per animation frame, built once instead of every frame
+        stalk_surf = self.stalk_surfaces.get(stalk_anim)
+        if stalk_surf is None:
+            stalk_surf = pygame.Surface((20, stalk_height), pygame.SRCALPHA, 32)
+            num_stalks = math.ceil(stalk_height / 50)
 
-        for s in range(num_stalks):
-            stalk_surf.blit(stalk_anim, (0, s * 50))
+            for s in range(num_stalks):
+                stalk_surf.blit(stalk_anim, (0, s * 50))
+            self.stalk_surfaces[stalk_anim] = stalk_surf
 
         engine.manager.blit_center(stalk_surf, self.pos + (0, stalk_height / 2))
         engine.manager.blit_center(head_anim, self.pos)
 
     def on_draw_debug(self, *args):
         surface = engine.get_surface()
-        pygame.draw.circle(surface, (255, 255, 200), self.pos, self.hitbox.radius, 1)
+        pygame.draw.circle(surface, (255, 255, 200), self.pos, self.radius, 1)
         if self.stalk_pos:
             pygame.draw.line(surface, (255, 255, 200), self.pos, self.stalk_pos)
 
@@ -1103,7 +1024,7 @@ class Npc(engine.TickableEntity):
         self.dialogue_idle_animation.serialize()
         self.dialogue_talking_animation.serialize()
 
-    def update(self, *args):
+    def on_draw(self, *args):
         if self.animation not in [self.idle_animation, self.talking_animation]:
             self.animation = self.idle_animation
 
@@ -1111,127 +1032,9 @@ class Npc(engine.TickableEntity):
         engine.manager.blit(anim, self.pos)
 
 
-class Spring:
-    GRAVITY_VECTOR = pygame.Vector2(0, 0)
-    DEBUG_COLOR = (255, 255, 200)
-
-    def __init__(self, pos, strength=20, dampening=0.2):
-        self.pos = Vector2(pos)
-        self.target_pos = Vector2(pos)
-        self.vel = Vector2()
-
-        self.strength = strength
-        self.dampening = dampening
-
-        self.gravity = self.GRAVITY_VECTOR
-
-    def update_vel(self, target_pos: pygame.Vector2 = None):
-        target_pos = target_pos or self.target_pos
-        distance = target_pos - self.pos
-        force = distance * self.strength
-        delta_time = engine.delta()
-
-        self.vel += (force + self.gravity) * delta_time
-        self.vel = self.vel.lerp(Vector2(0, 0), pygame.math.clamp(self.dampening * delta_time, 0, 1))
-
-    def update(self):
-        vel = self.vel  # Local variable
-        delta_time = engine.delta()
-        self.pos += vel * delta_time
-
-    def draw_debug(self):
-        surface = engine.get_surface()
-        pygame.draw.circle(surface, self.DEBUG_COLOR, self.pos, 5, 1)
-
-
-class RotationSpring:
-    def __init__(self, rotation, target_rotation, strength=1.0, dampening=1.0):
-        self.rotation = rotation
-        self.target_rotation = target_rotation
-        self.angular_velocity = 0
-
-        self.strength = strength
-        self.dampening = dampening
-
-    def update(self):
-        self.angular_velocity += (self.target_rotation - self.rotation) * engine.delta() * self.strength
-        self.angular_velocity = engine.math.lerp(self.angular_velocity, 0, self.dampening * engine.delta())
-
-        self.rotation += self.angular_velocity
-
-
-class Vine(engine.TickableEntity):
-    def __init__(self, pos, length=None, use_world_pos=False):
-        self.pos = pos if use_world_pos else tile_to_world(pos)
-        self.length = length if length else random.randint(50, 100)
-
-        self.segment_distance = 10
-        self.num_segments = self.length // self.segment_distance
-        self.spring_strength = 40
-        self.spring_dampening = 1
-        self.spring_gravity = Vector2(0, 100)
-
-        self.player_influence = random.uniform(1, 5)
-        self.wind_influence = random.uniform(-1, 4)
-
-        self.springs = [Spring(Vector2(self.pos.x, self.pos.y + self.segment_distance * y),
-                               self.spring_strength,
-                               self.spring_dampening)
-                        for y in range(self.num_segments)]
-
-        for spring in self.springs:
-            spring.gravity = self.spring_gravity
-
-        self.colour = random.choice((
-            (25, 60, 62),
-            (38, 92, 66),
-            (62, 137, 72)
-        ))
-
-        self.points = []
-
-    def update(self, *args):
-        global wind
-        scene = args[0]
-        player = scene.objects["player"]
-
-        if not player:
-            return
-
-        self.points = [self.pos]
-
-        for i, spring in enumerate(self.springs):
-            target_pos_above = self.pos
-
-            if i > 0:
-                target_pos_above = self.springs[i - 1].pos
-
-            spring.update_vel(target_pos_above)
-
-            if i < len(self.springs) - 1:
-                target_pos_below = self.springs[i + 1].pos
-                spring.update_vel(target_pos_below)
-
-            if player.rect.collidepoint(spring.pos):
-                spring.vel.x += (player.vel + player.controlled_vel).x * self.player_influence * engine.delta()
-
-            spring.vel.x -= (wind * self.wind_influence * engine.delta())
-
-            spring.update()
-
-            self.points.append(spring.pos)
-
-    def on_draw(self, *args):
-        pygame.draw.lines(engine.get_surface(), self.colour, False, self.points, 6)
-        pygame.draw.circle(engine.get_surface(), self.colour, self.points[-1] + (1, 0), 3)
-
-    def on_draw_debug(self, *args):
-        pygame.draw.lines(engine.get_surface(), (0, 0, 255), False, self.points, 1)
-        for spring in self.springs:
-            spring.draw_debug()
-
-
 class VinePatch(engine.TickableEntity):
+    update_offscreen = False
+
     def __init__(self, pos, size, length_range, use_world_pos=False):
         self.pos = pos if use_world_pos else tile_to_world(pos)
         self.width = (size if use_world_pos else tile_to_world(size)).x
@@ -1241,134 +1044,383 @@ class VinePatch(engine.TickableEntity):
         self.vine_spacing = 12
         self.num_vines = int(self.width // self.vine_spacing)
 
-        self.vines = set()
+        self.field = None
+
+        # Vines only react to the player while it is inside this area
+        self.player = None
+        self.trigger = engine.Trigger(self, pygame.Rect(self.pos.x - 40, self.pos.y, self.width + 80,
+                                                        self.length_range[1] + 40), engine.triggers.LAYER_PLAYER)
+
+    def serialize(self):
+        self.player = None
+
+    def get_bounds(self):
+        return self.trigger.rect
+
+    def on_trigger_enter(self, *args):
+        self.player = args[0]
+
+    def on_trigger_exit(self, *args):
+        self.player = None
 
     def generateVines(self):
-        self.vines = set(
-            Vine(self.pos + (x * self.vine_spacing + random.randint(0, 3), 0), random.randint(*self.length_range),
-                 True) for x in range(self.num_vines))
+        roots = [self.pos + (x * self.vine_spacing + random.randint(0, 3), 0) for x in range(self.num_vines)]
+        lengths = [random.randint(*self.length_range) for _ in range(self.num_vines)]
+        self.field = VineField(roots, lengths)
 
     def update(self, *args):
-        if not self.vines:
+        if self.field is None:
             self.generateVines()
-        for vine in self.vines:
-            vine.update(*args)
+        self.field.update(self.player)
 
     def on_draw(self, *args):
-        for vine in self.vines:
-            vine.on_draw(*args)
+        if self.field is not None:
+            self.field.on_draw()
 
     def on_draw_debug(self, *args):
-        for vine in self.vines:
-            vine.on_draw_debug(*args)
+        if self.field is not None:
+            self.field.on_draw_debug()
+
+
+class VineField:
+    # Every point of every vine in a VinePatch in one (vine, point) array, simulated with Verlet integration and
+    # distance constraints. Point 0 of each vine is its root and never moves, shorter vines are padded with points
+    # that don't move, and the links to them are masked out so they don't pull on the vine's tip.
+    COLOURS = (
+        (25, 60, 62),
+        (38, 92, 66),
+        (62, 137, 72)
+    )
+    SEGMENT_DISTANCE = 10
+    GRAVITY = 300  # Swings at about the speed the old spring vines did
+    DAMPING = 2
+    ITERATIONS = 4
+    MAX_STEP = 1 / 60  # Longer frames are split into steps of at most this long
+
+    def __init__(self, roots, lengths):
+        rng = np.random.default_rng()
+        self.rng = rng
+
+        self.point_counts = [length // self.SEGMENT_DISTANCE + 1 for length in lengths]
+        vine_count, point_count = len(self.point_counts), max(self.point_counts, default=1)
+
+        self.pos = np.empty((vine_count, point_count, 2))
+        self.rest_length = np.zeros((vine_count, point_count - 1))
+        self.inverse_mass = np.zeros((vine_count, point_count))
+        self.valid = np.zeros((vine_count, point_count), dtype=bool)
+        for v, (root, count) in enumerate(zip(roots, self.point_counts)):
+            # The old spring vines settled with segment k from the bottom (2k - 1) * 2.5 px long, keep that shape
+            segments = count - 1
+            rest_length = [(2 * k - 1) * 2.5 for k in range(segments, 0, -1)]
+            self.rest_length[v, :segments] = rest_length
+            self.pos[v, :, 0] = root[0]
+            self.pos[v, 0, 1] = root[1]
+            self.pos[v, 1:, 1] = root[1] + np.cumsum(rest_length + [0] * (point_count - count))
+            self.inverse_mass[v, 1:count] = 1
+            self.valid[v, :count] = True
+        self.previous_pos = self.pos.copy()
+
+        self.player_influence = rng.uniform(1, 5, (vine_count, 1))
+        self.wind_influence = rng.uniform(-1, 4, (vine_count, 1))
+        self.colours = [self.COLOURS[i] for i in rng.integers(0, len(self.COLOURS), vine_count)]
+
+        # Links are solved in two halves, every other link of each vine, so no point is moved twice at once.
+        # Each half stores how much of a correction goes to the upper and the lower point, none for links to padding.
+        self.link_groups = []
+        for parity in (0, 1):
+            upper = self.inverse_mass[:, parity:-1:2]
+            lower = self.inverse_mass[:, parity + 1::2]
+            real = self.valid[:, parity + 1::2]
+            weight = np.maximum(upper + lower, 1e-9)
+            self.link_groups.append((parity, self.rest_length[:, parity::2], upper / weight * real,
+                                     lower / weight * real))
+
+    def get_bounds(self):
+        points = self.pos[self.valid]
+        left, top = points.min(axis=0)
+        right, bottom = points.max(axis=0)
+        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
+    def update(self, player):
+        steps = max(1, math.ceil(engine.delta() / self.MAX_STEP - 1e-9))
+        for _ in range(steps):
+            self.step(player, engine.delta() / steps)
+
+    def step(self, player, delta):
+        global wind
+        pos = self.pos
+
+        velocity = (pos - self.previous_pos) * (1 - min(self.DAMPING * delta, 1))
+        velocity[:, :, 1] += self.GRAVITY * delta * delta
+        velocity[:, :, 0] -= wind * self.wind_influence * delta * delta
+
+        # Only points of a patch the player is actually in get tested one by one
+        if player and player.rect.colliderect(self.get_bounds()):
+            rect = player.rect
+            x, y = pos[:, :, 0], pos[:, :, 1]
+            touched = (x >= rect.left) & (x < rect.right) & (y >= rect.top) & (y < rect.bottom)
+            velocity[:, :, 0] += touched * (player.vel + player.controlled_vel).x * self.player_influence * delta * delta
+
+        velocity *= self.inverse_mass[:, :, None]
+        self.previous_pos = pos.copy()
+        pos += velocity
+
+        for _ in range(self.ITERATIONS):
+            for parity, rest_length, upper_share, lower_share in self.link_groups:
+                upper = pos[:, parity:-1:2]
+                lower = pos[:, parity + 1::2]
+                offset = lower - upper
+                distance = np.maximum(np.hypot(offset[:, :, 0], offset[:, :, 1]), 1e-6)
+                stretch = ((distance - rest_length) / distance)[:, :, None] * offset
+                upper += stretch * upper_share[:, :, None]
+                lower -= stretch * lower_share[:, :, None]
+
+    def on_draw(self):
+        queue = engine.manager.render_queue
+        for points, count, colour in zip(self.pos.tolist(), self.point_counts, self.colours):
+            if count < 2:
+                continue
+            queue.lines(colour, False, points[:count], 6)
+            queue.circle(colour, (points[count - 1][0] + 1, points[count - 1][1]), 3)
+
+    def on_draw_debug(self):
+        surface = engine.get_surface()
+        for points, count in zip(self.pos.tolist(), self.point_counts):
+            if count < 2:
+                continue
+            pygame.draw.lines(surface, (0, 0, 255), False, points[:count], 1)
+            for p in points[1:count]:
+                pygame.draw.circle(surface, (255, 255, 200), p, 5, 1)
 
 
 class GrassPatch(engine.TickableEntity):
+    update_offscreen = False
+
     def __init__(self, pos, width):
         self.pos = Vector2(pos)
         self.width = width
 
         self.interval = 5  # 3 if engine.settings.getConfig().getboolean("graphics", "fancy_grass") else 4
 
-        self.grass = set()
+        self.field = None
+
+        # Grass only reacts to the player while it is inside this area
+        self.player = None
+        self.trigger = engine.Trigger(self, pygame.Rect(self.pos.x - 3, self.pos.y - 20, self.width + 6, 20),
+                                      engine.triggers.LAYER_PLAYER)
+
+    def get_bounds(self):
+        return self.trigger.rect
+
+    def on_trigger_enter(self, *args):
+        self.player = args[0]
+
+    def on_trigger_exit(self, *args):
+        self.player = None
 
     def generateGrass(self):
-        self.grass = set(Grass(self.pos + (x * self.interval, 0)) for x in range(int(self.width / self.interval)))
+        self.field = GrassField(self.pos, self.width, self.interval)
 
     def serialize(self):
-        self.grass = []
+        self.field = None
+        self.player = None
 
     def update(self, *args):
         if engine.settings.getConfig().getboolean("graphics", "grass"):
-            if not self.grass:
+            if self.field is None:
                 self.generateGrass()
-            for g in self.grass:
-                g.update(*args)
+            self.field.update(self.player, engine.manager.get_view_rect())
 
     def on_draw(self, *args):
-        if engine.settings.getConfig().getboolean("graphics", "grass"):
-            for g in self.grass:
-                g.on_draw()
+        if engine.settings.getConfig().getboolean("graphics", "grass") and self.field is not None:
+            self.field.on_draw(engine.manager.get_view_rect())
 
     def on_draw_debug(self, *args):
-        if engine.settings.getConfig().getboolean("graphics", "grass"):
-            for g in self.grass:
-                g.on_draw_debug()
-
-
-class Grass(engine.TickableEntity):
-    def __init__(self, pos):
-        self.pos = Vector2(pos)
-        self.pos.x += random.randint(-1, 1)
-
-        self.randomize_attributes()
-
-        self.trigger_rect = pygame.Rect(0, 0, self.width, self.height)
-        self.trigger_rect.midbottom = self.pos
-
-        self.rot_spring = RotationSpring(0, 0, self.strength, self.damp)
-
-        self.colour = random.choice((
-            (25, 60, 62),
-            (38, 92, 66),
-            (62, 137, 72)
-        ))
-
-        self.grass_tip = Vector2()
-        self.points = []
-
-    def randomize_attributes(self):
-        self.influence = Vector2(
-            random.uniform(0.05, 0.09),
-            random.uniform(0.1, 0.3)
-        )
-        self.wind_strength = random.randint(2, 12)
-        self.width = random.randint(1, 2)
-        self.height = random.randint(5, 20)
-        self.damp = random.uniform(0.7, 1.5)
-        self.strength = random.uniform(0.7, 1.5)
-
-    def update(self, *args):
-        global wind
-
-        scene = args[0]
-        player = scene.objects.get("player")
-
-        if not player:
+        if engine.settings.getConfig().getboolean("graphics", "grass") and self.field is not None:
+            self.field.on_draw_debug(engine.manager.get_view_rect())
+
+
+class GrassField:
+    # Every blade of a GrassPatch kept in arrays, one entry per blade, so wind, player pushes and the blade shapes
+    # are worked out for the whole patch at once. Blades are grouped into fixed width chunks: only chunks the player
+    # overlaps test for pushes, and chunks that are off-screen and have settled since their last push aren't
+    # simulated or drawn at all.
+    COLOURS = (
+        (25, 60, 62),
+        (38, 92, 66),
+        (62, 137, 72)
+    )
+    CHUNK_WIDTH = 160
+    SETTLE_TIME = 3  # Seconds after the last push before an off-screen chunk stops simulating
+
+    # Blade sprites shared by every field, (height, width, colour, fancy) -> one slot per ANGLE_STEP degrees. A slot
+    # is rendered the first time a blade leans that far, so only the angles the wind actually reaches get drawn.
+    ANGLE_STEP = 2
+    blade_sprites = {}
+
+    def __init__(self, pos, width, interval):
+        rng = np.random.default_rng()
+        self.rng = rng
+        count = int(width / interval)
+
+        self.x = pos.x + np.arange(count) * interval + rng.integers(-1, 2, count)
+        self.y = pos.y
+
+        self.influence_x = rng.uniform(0.05, 0.09, count)
+        self.influence_y = rng.uniform(0.1, 0.3, count)
+        self.wind_strength = rng.integers(2, 13, count)
+        self.width = rng.integers(1, 3, count)
+        self.height = rng.integers(5, 21, count)
+        self.damp = rng.uniform(0.7, 1.5, count)
+        self.strength = rng.uniform(0.7, 1.5, count)
+        self.colours = [self.COLOURS[i] for i in rng.integers(0, len(self.COLOURS), count)]
+        self.blade_keys = list(zip(self.height.tolist(), self.width.tolist(), self.colours))
+        self.roots = list(zip(self.x.tolist(), [self.y] * count))
+
+        self.rotation = np.zeros(count)  # Degrees, 0 is straight up
+        self.angular_velocity = np.zeros(count)
+
+        # Each blade's hitbox, a width x height rect standing on its root
+        self.left = self.x - self.width // 2
+        self.right = self.left + self.width
+        self.top = self.y - self.height
+
+        self.points = np.empty((count, 3, 2))
+        self.points[:, 0, 0] = self.x - self.width
+        self.points[:, 1, 0] = self.x + self.width
+        self.points[:, :2, 1] = self.y
+        self.update_tips(0, count)
+
+        # Chunk i holds blades [i * chunk_size, (i + 1) * chunk_size), its rect covers the blades however far they lean
+        self.chunk_size = max(1, int(self.CHUNK_WIDTH / interval))
+        self.chunks = []
+        self.chunk_rects = []
+        for start in range(0, count, self.chunk_size):
+            end = min(start + self.chunk_size, count)
+            reach = int(self.height[start:end].max()) + 2
+            left = int(self.x[start:end].min()) - reach
+            right = int(self.x[start:end].max()) + reach
+            self.chunks.append((start, end))
+            self.chunk_rects.append(pygame.Rect(left, self.y - reach, right - left, reach * 2))
+        self.chunk_idle_time = [self.SETTLE_TIME] * len(self.chunks)
+
+    def __len__(self):
+        return len(self.x)
+
+    def update(self, player, view_rect):
+        delta = engine.delta()
+        player_rect = player.rect if player else None
+
+        active = []
+        for i, rect in enumerate(self.chunk_rects):
+            self.chunk_idle_time[i] += delta
+            if player_rect is not None and rect.colliderect(player_rect):
+                self.push(i, player, delta)
+            if self.chunk_idle_time[i] < self.SETTLE_TIME or rect.colliderect(view_rect):
+                active.append(i)
+
+        # Neighbouring active chunks are simulated as one slice
+        run_start = None
+        for n, i in enumerate(active):
+            if run_start is None:
+                run_start = self.chunks[i][0]
+            if n + 1 == len(active) or active[n + 1] != i + 1:
+                self.simulate(run_start, self.chunks[i][1], delta)
+                run_start = None
+
+    def push(self, chunk, player, delta):
+        start, end = self.chunks[chunk]
+        rect = player.rect
+        touched = (self.left[start:end] < rect.right) & (self.right[start:end] > rect.left) & (
+                self.top[start:end] < rect.bottom) & (self.y > rect.top)
+        if not touched.any():
             return
 
-        self.rot_spring.angular_velocity -= (wind * self.wind_strength * engine.delta())
+        push = player.vel + player.controlled_vel
+        direction = self.rng.choice((-1, 1), end - start)
+        self.angular_velocity[start:end] += touched * (
+                push.x * self.influence_x[start:end] + push.y * self.influence_y[start:end] * direction) * delta
+        self.chunk_idle_time[chunk] = 0
 
-        if self.trigger_rect.colliderect(player.rect):
-            self.rot_spring.angular_velocity += ((player.vel.x + player.controlled_vel.x) *
-                                                 self.influence.x * engine.delta())
-            self.rot_spring.angular_velocity += ((player.vel.y + player.controlled_vel.y) *
-                                                 self.influence.y * random.choice((-1, 1)) * engine.delta())
-
-        self.rot_spring.update()
-
-        up_vector = engine.VEC2_UP
-        self.grass_tip = self.pos + up_vector.rotate(self.rot_spring.rotation) * self.height
-
-        self.points = [self.pos - (self.width, 0), self.pos + (self.width, 0), self.grass_tip]
-
-    def on_draw(self, *args):
-        if not self.points:
-            return
-
-        surface = engine.get_surface()
-        pygame.draw.polygon(surface, self.colour, self.points, width=3)
-
-        if engine.settings.getConfig().getboolean("graphics", "fancy_grass"):
-            for p in self.points:
-                pygame.draw.circle(surface, self.colour, p, 1.5)
-
-    def on_draw_debug(self, *args):
+    def simulate(self, start, end, delta):
+        global wind
+        angular_velocity = self.angular_velocity[start:end]
+        rotation = self.rotation[start:end]
+
+        angular_velocity -= wind * self.wind_strength[start:end] * delta
+
+        # Spring pulling every blade back upright
+        angular_velocity -= rotation * delta * self.strength[start:end]
+        angular_velocity -= angular_velocity * self.damp[start:end] * delta
+        rotation += angular_velocity
+
+        self.update_tips(start, end)
+
+    def update_tips(self, start, end):
+        angle = np.radians(self.rotation[start:end])
+        self.points[start:end, 2, 0] = self.x[start:end] + np.sin(angle) * self.height[start:end]
+        self.points[start:end, 2, 1] = self.y - np.cos(angle) * self.height[start:end]
+
+    def visible_chunks(self, view_rect):
+        return [self.chunks[i] for i in view_rect.collidelistall(self.chunk_rects)]
+
+    @classmethod
+    def get_blade_sprite(cls, key, fancy, angle_index):
+        slots = cls.blade_sprites.get((*key, fancy))
+        if slots is None:
+            slots = cls.blade_sprites[(*key, fancy)] = [None] * (360 // cls.ANGLE_STEP)
+        sprite = slots[angle_index]
+        if sprite is None:
+            sprite = slots[angle_index] = cls.render_blade(*key, fancy, angle_index * cls.ANGLE_STEP)
+        return sprite
+
+    @staticmethod
+    def render_blade(height, width, colour, fancy, angle):
+        # Same shape the blade used to be drawn with every frame, with its root at -offset on the sprite
+        angle = math.radians(angle)
+        points = [(-width, 0), (width, 0), (math.sin(angle) * height, -math.cos(angle) * height)]
+        xs, ys = zip(*points)
+        margin = 3
+        left, top = math.floor(min(xs)) - margin, math.floor(min(ys)) - margin
+        size = (math.ceil(max(xs)) - left + margin + 1, math.ceil(max(ys)) - top + margin + 1)
+
+        image = pygame.Surface(size, pygame.SRCALPHA)
+        points = [(x - left, y - top) for x, y in points]
+        pygame.draw.polygon(image, colour, points, width=3)
+        if fancy:
+            for p in points:
+                pygame.draw.circle(image, colour, p, 1.5)
+        return image, (left, top)
+
+    def on_draw(self, view_rect):
+        fancy = engine.settings.getConfig().getboolean("graphics", "fancy_grass")
+        steps = 360 // self.ANGLE_STEP
+
+        blits = []
+        for start, end in self.visible_chunks(view_rect):
+            angle_indices = (np.rint(self.rotation[start:end] / self.ANGLE_STEP).astype(int) % steps).tolist()
+            for key, (x, y), angle_index in zip(self.blade_keys[start:end], self.roots[start:end], angle_indices):
+                image, (left, top) = self.get_blade_sprite(key, fancy, angle_index)
+                blits.append((image, (x + left, y + top)))
+
+        engine.manager.render_queue.blits(blits)
+
+    def on_draw_debug(self, view_rect):
         surface = engine.get_surface()
-        pygame.draw.line(surface, (0, 0, 255), self.pos, self.grass_tip, 1)
+        for start, end in self.visible_chunks(view_rect):
+            points = self.points[start:end]
+            for root, tip in zip(points[:, :2].mean(axis=1).tolist(), points[:, 2].tolist()):
+                pygame.draw.line(surface, (0, 0, 255), root, tip, 1)
+        for i, rect in enumerate(self.chunk_rects):
+            colour = (0, 0, 255) if self.chunk_idle_time[i] < self.SETTLE_TIME else (100, 100, 100)
+            pygame.draw.rect(surface, colour, rect, 1)
 
 
 class Water(engine.TickableEntity):
+    # The surface is a row of columns every step_size px running a damped 1D wave equation: each column is pulled
+    # towards its neighbours and back to rest. Frames longer than max_step are split up so it can't blow up.
+    update_offscreen = False
+
     def __init__(self, pos, size):
         self.pos = tile_to_world(pos)
         self.size = tile_to_world(size)
@@ -1381,20 +1433,44 @@ class Water(engine.TickableEntity):
         ]
 
         self.influence = 2
-
-        self.springs = []
-        self.points = []
+        self.strength = 20
+        self.dampening = 0.6
+        # Highest frequency of the surface is sqrt(5 * strength), stepping at half the explicit stability limit
+        self.max_step = 1 / math.sqrt(5 * self.strength)
 
         self.step_size = 10
         self.width = self.anchors[1].x - self.anchors[0].x
         self.height = self.anchors[3].y - self.anchors[0].y
-        y = self.anchors[0].y
-        start_x = self.anchors[0].x
-        for x in range(round(self.width / self.step_size) + 1):
-            x_ = x * self.step_size
-            self.springs.append(Spring([start_x + x_, y]))
-        self.springs[-1].target_pos.x = self.anchors[1].x
-        self.springs[-1].pos.x = self.anchors[1].x
+        self.surface_y = self.anchors[0].y
+        self.column_x = self.anchors[0].x + np.arange(round(self.width / self.step_size) + 1) * self.step_size
+        self.column_x[-1] = self.anchors[1].x
+
+        self.heights = np.zeros(len(self.column_x))  # Offset of each column from the resting surface
+        self.velocities = np.zeros(len(self.column_x))
+        self.points = []
+
+        self.bounds = pygame.Rect(self.pos, self.size)
+
+    def get_bounds(self):
+        return self.bounds
+
+    def splash(self, rect, velocity):
+        # Columns within step_size of the rect, found by index instead of testing every column
+        first = max(math.ceil((rect.left - self.step_size - self.column_x[0]) / self.step_size), 0)
+        last = min(math.floor((rect.right + self.step_size - self.column_x[0]) / self.step_size), len(self.column_x) - 1)
+        if first > last:
+            return
+        y = self.surface_y + self.heights[first:last + 1]
+        hit = (y > rect.top - self.step_size) & (y < rect.bottom + self.step_size)
+        self.velocities[first:last + 1] += hit * velocity
+
+    def step(self, delta):
+        heights = self.heights
+        padded = np.pad(heights, 1)
+        acceleration = self.strength * (padded[:-2] + padded[2:] - 3 * heights)
+        self.velocities += acceleration * delta
+        self.velocities *= 1 - min(self.dampening * delta, 1)
+        heights += self.velocities * delta
 
     def update(self, *args):
         scene = args[0]
@@ -1404,39 +1480,37 @@ class Water(engine.TickableEntity):
         if not player:
             return
 
-        self.points = []
-        for i, s in enumerate(self.springs):
-            col_circle = pygame.geometry.Circle(s.pos, self.step_size)
-
-            if col_circle.colliderect(player.rect):
-                s.vel.y += player.vel.y * self.influence * engine.delta()
+        delta = engine.delta()
+        self.splash(player.rect, player.vel.y * self.influence * delta)
 
-            pos_up = Vector2(s.pos.x, self.springs[i - 1].pos.y) if i > 0 else None
-            pos_down = Vector2(s.pos.x, self.springs[i + 1].pos.y) if i < len(self.springs) - 1 else None
+        steps = max(1, math.ceil(delta / self.max_step - 1e-9))
+        for _ in range(steps):
+            self.step(delta / steps)
 
-            s.update_vel(pos_up)
-            s.update_vel(pos_down)
-            s.update_vel()
-            s.update()
-            self.points.append(s.pos)
+        self.points = np.stack((self.column_x, self.surface_y + self.heights), axis=1).tolist()
 
     def on_draw(self, *args):
-        engine.util.draw_polygon_alpha(engine.get_surface(), (0, 149, 233, 150),
-                                       [*self.points, self.anchors[2], self.anchors[3]])
-        pygame.draw.lines(engine.get_surface(), (255, 255, 255), False, self.points, 5)
+        if not self.points:
+            return
+        queue = engine.manager.render_queue
+        queue.polygon_alpha((0, 149, 233, 150), [*self.points, self.anchors[2], self.anchors[3]])
+        queue.lines((255, 255, 255), False, self.points, 5)
 
     def on_draw_debug(self, *args):
+        if not self.points:
+            return
         pygame.draw.lines(engine.get_surface(), (255, 255, 200), False, self.points, 1)
         pygame.draw.polygon(engine.get_surface(), (0, 0, 255), self.anchors, 1)
         for p in self.points:
             pygame.draw.circle(engine.get_surface(), (255, 255, 200), p, 3)
+            pygame.draw.circle(engine.get_surface(), (255, 255, 200), p, 5, 1)
         for a in self.anchors:
             pygame.draw.circle(engine.get_surface(), (0, 0, 255), a, 3)
-        for s in self.springs:
-            s.draw_debug()
 
 
 class Light(engine.TickableEntity):
+    update_offscreen = False
+
     def __init__(self, pos, radius):
         self.pos = tile_to_world(pos)
         self.radius = radius
@@ -1455,34 +1529,94 @@ class Light(engine.TickableEntity):
             case "very low":
                 self.angle_step_size = 4
         self.touched_objects = []
+        self.points = []
+
+        # "visibility" sweeps the edges of nearby occluders, "rays" casts a ray every angle_step_size degrees
+        self.mode = engine.settings.getConfig().get("graphics", "light_mode", fallback="visibility")
+
+        self.colour = (255, 255, 200, 50)
+        self.bounds = pygame.Rect(0, 0, self.radius * 2, self.radius * 2)
+        self.bounds.center = self.pos
+
+        self.surface = None
+        self.surface_pos = Vector2()
+        self.occluder_key = None  # Rects of the moving occluders the current polygon was cast against
+
+    def serialize(self):
+        self.surface = None
+        self.occluder_key = None
+        self.touched_objects = []
+
+    def get_bounds(self):
+        return self.bounds
 
     def update(self, *args):
         scene = args[0]
 
-        touched_objects = []
-
-        collidable_objects = [*scene.physics_objects]
+        occluders = [o for o in scene.spatial_hash.query(self.bounds) if hasattr(o, "rect")]
+        tile_grid = scene.tile_grid
+        if tile_grid is not None:
+            # Tile batches are replaced by the outline of the tiles, which leaves out every edge buried in solid
+            dynamic_occluders = [o for o in occluders if o not in tile_grid.objects]
+            occluders = [*tile_grid.outline().query(self.bounds), *dynamic_occluders]
+        else:
+            dynamic_occluders = occluders
 
-        collision_points = []
+        # Static geometry never moves, so the light only has to be cast again when a moving occluder in range does
+        occluder_key = tuple(tuple(o.rect) for o in dynamic_occluders)
+        if occluder_key == self.occluder_key:
+            return
+        self.occluder_key = occluder_key
 
-        for s_ in range(int(360 / self.angle_step_size)):
-            s = s_ * self.angle_step_size
-            direction = Vector2(0, 1).rotate(s)
-            pos = Vector2(self.pos)
+        if dynamic_occluders:
+            self.points, self.touched_objects = self.cast(occluders)
+            self.surface, self.surface_pos = self.render(self.points)
+            return
 
-            collision_point, collided_object = engine.linecast(pos, direction, self.radius, collidable_objects)
+        # Baked once per level and kept for the session, so coming back to a room costs nothing
+        key = (scene.position, tuple(self.pos), self.radius, self.mode, self.angle_step_size)
+        baked = engine.lighting.baked_lights.get(key)
+        if baked is None:
+            points, _ = self.cast(occluders)
+            baked = engine.lighting.baked_lights[key] = (points, *self.render(points))
+        self.points, self.surface, self.surface_pos = baked
+        self.touched_objects = occluders
+
+    def render(self, points):
+        # With shaders on the polygon goes to the GPU lightmap every frame instead of onto a surface
+        if engine.manager.engine.lightmap is not None:
+            return None, Vector2()
+        return engine.lighting.render_polygon(self.colour, points)
+
+    def cast(self, occluders):
+        if self.mode == "rays":
+            return self.cast_rays(occluders)
+        return self.cast_visibility(occluders)
+
+    def cast_visibility(self, occluders):
+        segments = engine.lighting.occluder_segments(self.pos, self.radius, occluders)
+        return engine.lighting.visibility_polygon(self.pos, self.radius, segments), occluders
+
+    def cast_rays(self, occluders):
+        directions = engine.lighting.ray_directions(self.angle_step_size)
+        return engine.lighting.cast_rays(self.pos, directions, self.radius, occluders)
 
-            collision_points.append(collision_point)
-            touched_objects.append(collided_object)
+    def on_draw(self, *args):
+        if len(self.points) < 3:
+            return
 
-        surface = engine.get_surface()
-        engine.util.draw_polygon_alpha(surface, (255, 255, 200, 50), collision_points)
+        queue = engine.manager.render_queue
+        lightmap = engine.manager.engine.lightmap
+        if lightmap is not None:
+            lightmap.add(self.pos, self.points, self.colour)
+        elif self.surface is not None:
+            queue.blit(self.surface, self.surface_pos)
 
         if engine.debug:
-            pygame.draw.lines(surface, (0, 0, 255), True, collision_points, 1)
-            for c in collision_points:
-                pygame.draw.line(surface, (255, 0, 0), self.pos, c, 1)
-            pygame.draw.circle(surface, (0, 0, 255), self.pos, 5)
+            queue.lines((0, 0, 255), True, self.points, 1)
+            for c in self.points:
+                queue.line((255, 0, 0), self.pos, c, 1)
+            queue.circle((0, 0, 255), self.pos, 5)
 
 
 class Collectible(engine.TickableEntity):
@@ -1490,23 +1624,20 @@ class Collectible(engine.TickableEntity):
         self.pos = tile_to_world(pos)
         self.animation = engine.Animation("assets/collectible/idle")
         self.trigger_rect = pygame.Rect(self.pos, (50, 50))
+        self.trigger = engine.Trigger(self, self.trigger_rect, engine.triggers.LAYER_PLAYER)
         self.enabled = True
 
     def serialize(self):
         self.animation.serialize()
 
-    def update(self, *args):
-        if not self.enabled:
-            return
-
-        scene: Level = args[0]
-        player = scene.objects["player"]
-
-        if not player:
-            return
+    def get_bounds(self):
+        return self.trigger_rect
 
-        if self.trigger_rect.colliderect(player.rect):
+    def on_trigger_enter(self, *args):
+        scene: Level = args[1]
+        if self.enabled:
             self.enabled = False
+            self.trigger.enabled = False
             save_data.global_save["hats_collected"] += 1
             scene.add_buffered_object("hat_collected_animation", engine.Animation(
                 "assets/collectible/collected",
@@ -1516,12 +1647,7 @@ class Collectible(engine.TickableEntity):
             ))
 
             play_randomly_pitched_sound(engine.get_asset("collectible"))
-
-            for p in range(20):
-                addParticle(self.trigger_rect.center, scene, "spark")
-
-            for p in range(20):
-                addParticle(self.trigger_rect.center, scene, "spark_purple")
+            scene.objects["particle manager"].emit(EMITTERS["sparks"], self.trigger_rect.center)
 
     def on_draw(self, *args):
         anim = self.animation.update_animation()
@@ -1532,6 +1658,8 @@ class Collectible(engine.TickableEntity):
 
 
 class Sprite(engine.Sprite):
+    static = True
+
     def __init__(self, image, pos=(0, 0)):
         _target_pos = tile_to_world(pos)
         _image: pygame.Surface = engine.get_asset(image)
@@ -1572,39 +1700,9 @@ class Batch:
         return result
 
 
-def addParticle(position, scene, particle_img="ground_particle"):
-    particle = scene.objects["particle manager"].addDefinedParticle(engine.Particle(
-        engine.get_asset(particle_img),
-        position,
-        [random.randint(-100, 100), random.randint(-100, 100)]
-    ))
-    particle.rotation_per_second = random.randint(-90, 90)
-    particle.scale_per_second = random.randint(-9, -2)
-
-
-def check_collision(rect, physics_objects):
-    for o in physics_objects:
-        if rect.colliderect(o.rect):
-            return o
-    # return None
-
-
 def unpack_level_layout(level):
-    batches = []
-
-    for y, row in enumerate(level):
-        temp_batches = [Batch(None, (0, 0), (0, 0))]
-        for x, tile in enumerate(row):
-            tile_type = LEVEL_IDS[tile]
-            if temp_batches[-1].type != tile_type:
-                temp_batches.append(Batch(tile_type, (x, y), (1, 1)))
-            else:
-                temp_batches[-1].size.x += 1
-
-        for batch in temp_batches:
-            if batch.type is None:
-                continue
-            batches.append(batch)
+    tile_types = [[LEVEL_IDS[tile] for tile in row] for row in level]
+    batches = [Batch(tile_type, (x, y), (width, height)) for tile_type, x, y, width, height in merge_tiles(tile_types)]
 
     objects = {}
     for i, batch in enumerate(batches):
@@ -1613,6 +1711,35 @@ def unpack_level_layout(level):
     return objects
 
 
+def exposed_spans(scene, rect, side):
+    # Horizontal spans (x, width) along the top or bottom edge of a platform that aren't covered by another tile
+    tile_grid = scene.tile_grid
+    if tile_grid is None:
+        return [(rect.left, rect.width)]
+
+    tile_x = int(rect.left // TILE_SIZE.x)
+    tile_width = int(rect.width // TILE_SIZE.x)
+    tile_y = int(rect.top // TILE_SIZE.y) - 1 if side == "top" else int(rect.bottom // TILE_SIZE.y)
+
+    # Most edges are either fully covered or fully open, the summed area table answers both without walking the row
+    covered = tile_grid.count_solid(tile_x, tile_y, tile_x + tile_width - 1, tile_y)
+    if covered == tile_width:
+        return []
+    if covered == 0:
+        return [(tile_x * TILE_SIZE.x, tile_width * TILE_SIZE.x)]
+
+    spans = []
+    for x in range(tile_x, tile_x + tile_width):
+        if tile_grid.is_solid(x, tile_y):
+            continue
+        world_x = x * TILE_SIZE.x
+        if spans and spans[-1][0] + spans[-1][1] == world_x:
+            spans[-1] = (spans[-1][0], spans[-1][1] + TILE_SIZE.x)
+        else:
+            spans.append((world_x, TILE_SIZE.x))
+    return spans
+
+
 def load_json_level(path, spawn_side="default"):
     print(f"Loading level from [{path}]")
 
@@ -1677,11 +1804,14 @@ def load_json_level(path, spawn_side="default"):
     for i, (k, v) in enumerate(objects.items()):
         level.add_object(k, v)
     for o in physics_objects:
-        level.physics_objects.append(o)
+        level.add_collider(o)
 
+    level.tile_grid = engine.physics.TileGrid.from_layout(layout, LEVEL_IDS, TILE_SIZE)
+    level.tile_grid.outline()
     objects = unpack_level_layout(layout)
     for i, (k, o) in enumerate(objects.items()):
         level.add_phys_object(k, o)
+        level.tile_grid.add_owner(o)
 
     level.spawn_positions = spawn_positions
     level.addPlayer(1, spawn_positions[spawn_side])
@@ -1711,7 +1841,8 @@ def save_level(level):
         print("Saving is disabled.")
         return None
     try:
-        level.physics_objects.remove(level.objects["player"])
+        level.remove_collider(level.objects["player"])
+        level.triggers.remove_actor(level.objects["player"])
         level.objects["player"] = None
         print("Removed player from level data")
     except Exception as e:
@@ -1720,6 +1851,7 @@ def save_level(level):
     for o in level.objects.values():
         if getattr(o, "serialize", False):
             o.serialize()
+    level.invalidate_static_layer()
     print("Prepared objects for serialization")
     level.manager = None
     print("Set level manager to none")
@@ -1770,6 +1902,7 @@ ENTITY_IDS = {
     "VinePatch": VinePatch,
     "Sprite": Sprite
 }
+EMITTERS = engine.load_emitters("gamedata/particles/emitters.json")
 
 cached_scene = None
 save_data = load_save()
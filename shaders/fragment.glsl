@@ -1,12 +1,27 @@
 #version 330 core
 
 uniform sampler2D tex;
+uniform sampler2D lightmap;
+uniform sampler2D sprites;
+uniform sampler2D ui;
+uniform bool ui_visible;
 uniform vec3 colour_correction;
 
 out vec4 color;
 in vec2 fragmentTexCoord;
 
 void main() {
-    color = vec4(texture(tex, fragmentTexCoord).rgb, 1.0);
+    // The sprite layer and lightmap are premultiplied, so laying them over the frame matches blending each sprite
+    // and then each light onto it in turn
+    vec4 sprite = texture(sprites, fragmentTexCoord);
+    vec3 base = texture(tex, fragmentTexCoord).rgb * (1.0 - sprite.a) + sprite.rgb;
+    vec4 light = texture(lightmap, fragmentTexCoord);
+    color = vec4(base * (1.0 - light.a) + light.rgb, 1.0);
+    if (ui_visible) {
+        // pygame_gui draws premultiplied onto transparent surfaces, the UI goes over the lit frame so lights don't
+        // tint it
+        vec4 overlay = texture(ui, fragmentTexCoord);
+        color.rgb = color.rgb * (1.0 - overlay.a) + overlay.rgb;
+    }
     color = vec4(color.r * colour_correction.x, color.g * colour_correction.y, color.b * colour_correction.z, 1.0);
-}
\ No newline at end of file
+}
@@ -0,0 +1,9 @@
+#version 330 core
+
+in vec4 fragmentColour;
+
+out vec4 color;
+
+void main() {
+    color = fragmentColour;
+}
@@ -0,0 +1,15 @@
+#version 330 core
+
+uniform vec2 resolution;
+
+layout (location = 0) in vec2 vert;
+layout (location = 1) in vec4 colour;
+
+out vec4 fragmentColour;
+
+void main()
+{
+    fragmentColour = colour;
+    // Pixel y = 0 ends up in the first row of the lightmap, which is also the top row of the frame texture
+    gl_Position = vec4(vert / resolution * 2.0 - 1.0, 0.0, 1.0);
+}
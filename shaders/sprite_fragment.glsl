@@ -0,0 +1,13 @@
+#version 330 core
+
+uniform sampler2D atlas;
+
+in vec2 fragmentTexCoord;
+in vec4 fragmentTint;
+
+out vec4 color;
+
+void main() {
+    vec4 texel = texture(atlas, fragmentTexCoord) * fragmentTint;
+    color = vec4(texel.rgb * texel.a, texel.a);
+}
@@ -0,0 +1,27 @@
+#version 330 core
+
+uniform vec2 resolution;
+
+layout (location = 0) in vec2 corner;
+in vec2 center;
+in vec2 size;
+in float rotation;
+in vec4 uv_rect;
+in vec4 tint;
+
+out vec2 fragmentTexCoord;
+out vec4 fragmentTint;
+
+void main()
+{
+    // Positive rotation turns counterclockwise on screen like pygame.transform.rotate, with y pointing down
+    vec2 local = (corner - 0.5) * size;
+    float c = cos(rotation);
+    float s = sin(rotation);
+    vec2 pos = center + vec2(local.x * c + local.y * s, local.y * c - local.x * s);
+
+    fragmentTexCoord = mix(uv_rect.xy, uv_rect.zw, corner);
+    fragmentTint = tint;
+    // Pixel y = 0 ends up in the first row of the sprite layer, which is also the top row of the frame texture
+    gl_Position = vec4(pos / resolution * 2.0 - 1.0, 0.0, 1.0);
+}